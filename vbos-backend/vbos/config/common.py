@@ -6,6 +6,44 @@ from configurations import Configuration
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+def cache_settings(default: str) -> dict:
+    """
+    CACHES setting of the backend selected by DJANGO_CACHE, or ``default``:
+      locmem   - per process; each gunicorn worker has its own cache
+      database - shared, in the vbos_cache table; run "python manage.py createcachetable"
+      file     - shared by the processes of one host, in DJANGO_CACHE_LOCATION
+      redis    - shared, at DJANGO_CACHE_LOCATION (redis://...)
+    DJANGO_CACHE_BACKEND and DJANGO_CACHE_LOCATION override the selected defaults.
+    """
+    backends = {
+        "locmem": ("django.core.cache.backends.locmem.LocMemCache", "vbos-default"),
+        "database": ("django.core.cache.backends.db.DatabaseCache", "vbos_cache"),
+        "file": (
+            "django.core.cache.backends.filebased.FileBasedCache",
+            "/var/tmp/vbos-cache",
+        ),
+        "redis": (
+            "django.core.cache.backends.redis.RedisCache",
+            "redis://127.0.0.1:6379/1",
+        ),
+    }
+    backend, location = backends[os.getenv("DJANGO_CACHE", default)]
+    backend = os.getenv("DJANGO_CACHE_BACKEND", backend)
+    caches = {
+        "default": {
+            "BACKEND": backend,
+            "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", location),
+            "TIMEOUT": int(os.getenv("DJANGO_CACHE_TIMEOUT", 300)),  # 5 min default
+        }
+    }
+    if "redis" not in backend:
+        # Django's default of 300 entries is too low for per-province/cluster responses
+        caches["default"]["OPTIONS"] = {
+            "MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", 5000))
+        }
+    return caches
+
+
 class Common(Configuration):
 
     INSTALLED_APPS = (
@@ -32,6 +70,7 @@ class Common(Configuration):
     # https://docs.djangoproject.com/en/2.0/topics/http/middleware/
     MIDDLEWARE = (
         "django.middleware.security.SecurityMiddleware",
+        "vbos.datasets.middleware.CompressionMiddleware",
         "django.contrib.sessions.middleware.SessionMiddleware",
         "corsheaders.middleware.CorsMiddleware",
         "django.middleware.common.CommonMiddleware",
@@ -97,6 +136,19 @@ class Common(Configuration):
     MEDIA_ROOT = join(os.path.dirname(BASE_DIR), "media")
     MEDIA_URL = "/media/"
 
+    # Uploaded import files hold data the API only serves to authenticated users,
+    # so they are kept out of MEDIA_ROOT, which is served publicly
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+        "imports": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": join(os.path.dirname(BASE_DIR), "imports")},
+        },
+    }
+
     TEMPLATES = [
         {
             "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -191,21 +243,28 @@ class Common(Configuration):
     # Custom user app
     AUTH_USER_MODEL = "users.User"
 
-    # Caching - LocMem for dev; set DJANGO_CACHE_BACKEND for production
-    # Options: django.core.cache.backends.db.DatabaseCache (LOCATION=vbos_cache)
-    #          django.core.cache.backends.redis.RedisCache (LOCATION=redis://...)
-    # For DatabaseCache: run "python manage.py createcachetable" before use
-    _cache_backend = os.getenv(
-        "DJANGO_CACHE_BACKEND",
-        "django.core.cache.backends.locmem.LocMemCache",
+    # Caching, see cache_settings(). The namespace versions behind ETags and
+    # cached responses live in this cache, so it must be shared by the web and
+    # import worker processes wherever both run (datasets.E001).
+    CACHES = cache_settings("locmem")
+    # Scheme and host the API is served at, used by the warm_cache command. Cache
+    # keys include them, so warming is skipped when they are not known.
+    CACHE_WARM_URL = os.getenv("DJANGO_CACHE_WARM_URL") or None
+
+    # Have PostGIS encode the geometries of the vector and region endpoints as
+    # GeoJSON instead of converting them feature by feature in Python
+    POSTGIS_GEOJSON = os.getenv("DJANGO_POSTGIS_GEOJSON", "yes").lower() in (
+        "true",
+        "1",
+        "yes",
     )
-    CACHES = {
-        "default": {
-            "BACKEND": _cache_backend,
-            "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", "vbos-default"),
-            "TIMEOUT": int(os.getenv("DJANGO_CACHE_TIMEOUT", 300)),  # 5 min default
-        }
-    }
+    # Decimals of the GeoJSON coordinates unless requested with ?precision=,
+    # 6 is about 10 cm
+    GEOJSON_PRECISION = int(os.getenv("DJANGO_GEOJSON_PRECISION", 6))
+    # Smallest API response body, in bytes, compressed with Brotli or gzip
+    COMPRESSION_MIN_SIZE = int(os.getenv("DJANGO_COMPRESSION_MIN_SIZE", 1024))
+    # Number of import jobs the process_import_jobs worker runs concurrently
+    IMPORT_WORKERS = int(os.getenv("DJANGO_IMPORT_WORKERS", 4))
 
     # Django Rest Framework
     REST_FRAMEWORK = {
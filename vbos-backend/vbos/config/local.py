@@ -21,3 +21,6 @@ class Local(Common):
 
     # CORS
     CORS_ALLOW_ALL_ORIGINS = True
+
+    # runserver, as requested by the frontend in development
+    CACHE_WARM_URL = os.getenv("DJANGO_CACHE_WARM_URL", "http://localhost:8000")
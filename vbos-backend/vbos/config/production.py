@@ -1,5 +1,5 @@
 import os
-from .common import Common
+from .common import Common, cache_settings
 
 
 class Production(Common):
@@ -17,6 +17,9 @@ class Production(Common):
     ]
     INSTALLED_APPS += ("gunicorn",)
 
+    # The web and import worker processes must share the cache, see cache_settings()
+    CACHES = cache_settings("database")
+
     # Static files (CSS, JavaScript, Images)
     # https://docs.djangoproject.com/en/2.0/howto/static-files/
     # http://django-storages.readthedocs.org/en/latest/index.html
@@ -26,6 +29,11 @@ class Production(Common):
         "staticfiles": {
             "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
         },
+        # Uploaded import files are not public, unlike the rest of the bucket
+        "imports": {
+            "BACKEND": "storages.backends.s3.S3Storage",
+            "OPTIONS": {"default_acl": "private", "querystring_auth": True},
+        },
     }
     AWS_S3_OBJECT_PARAMETERS = {
         "CacheControl": "max-age=2592000",
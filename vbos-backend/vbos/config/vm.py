@@ -4,7 +4,7 @@ Uses local file storage (no S3) and relaxed CORS for VM IP access.
 """
 import os
 
-from .common import Common
+from .common import Common, cache_settings
 
 
 class Vm(Common):
@@ -24,5 +24,11 @@ class Vm(Common):
         "http://127.0.0.1",
     ]
 
+    # The web and import worker processes must share the cache, see cache_settings()
+    CACHES = cache_settings("database")
+
+    # warm_cache renders responses as requested through nginx on the VM host
+    CACHE_WARM_URL = os.getenv("DJANGO_CACHE_WARM_URL", _vm_host)
+
     # CORS – allow VM origin (CORS_ALLOW_ALL_ORIGINS=True for simplicity on VM)
     CORS_ALLOW_ALL_ORIGINS = True
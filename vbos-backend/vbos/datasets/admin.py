@@ -1,37 +1,46 @@
-import csv
 import json
-from io import TextIOWrapper
 
 from adminsortable2.admin import SortableAdminMixin
-from django.contrib.admin import SimpleListFilter
+from django.contrib.admin import RelatedFieldListFilter, SimpleListFilter
 from django.contrib import messages
 from django.contrib.gis import admin
-from django.contrib.gis.geos.geometry import GEOSGeometry
+from django.http import JsonResponse
 from django.shortcuts import redirect, render, reverse
 from django.urls import path
 
+from .cache import bump_namespace, dataset_namespace
 from .forms import GeoJSONUploadForm
 from .models import (
-    AreaCouncil,
+    SIMPLIFIED_GEOMETRY_FIELDS,
     Cluster,
+    ImportJob,
     PMTilesDataset,
-    Province,
     RasterDataset,
     RasterFile,
     TabularDataset,
     TabularItem,
     VectorDataset,
     VectorItem,
+    related_region_geometries,
 )
 from .utils import (
-    CSVRow,
-    GeoJSONProperties,
+    NEWLINE_DELIMITED_GEOJSON_EXTENSIONS,
     clean_redundant_tabular_items,
-    create_tabular_item,
-    import_wide_format_csv,
+    refresh_tabular_aggregates,
+    tabular_aggregate_group,
+    tabular_aggregate_groups,
 )
 
 
+def import_progress_url(jobs):
+    ids = ",".join(str(job.pk) for job in jobs)
+    return f"{reverse('admin:datasets_importjob_progress')}?ids={ids}"
+
+
+def invalidate_vector_items(datasets):
+    bump_namespace(*(dataset_namespace("vector", i) for i in datasets))
+
+
 class YearListFilter(SimpleListFilter):
     title = "Year"
     parameter_name = "year"
@@ -49,6 +58,43 @@ class YearListFilter(SimpleListFilter):
         return queryset
 
 
+class RegionListFilter(RelatedFieldListFilter):
+    """Province or area council filter that loads only the region names."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        return list(
+            field.related_model.objects.order_by(*ordering or ["name"]).values_list(
+                "pk", "name"
+            )
+        )
+
+
+class RegionItemAdminMixin:
+    """
+    Keep the geometries of the province and area council of the items out of the
+    changelist, filter and change form queries: only their names are shown.
+    """
+
+    region_fields = ("province", "area_council")
+    list_select_related = ["dataset", *region_fields]
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related(*self.region_fields)
+            .defer(*related_region_geometries(*self.region_fields))
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.region_fields:
+            kwargs["queryset"] = db_field.related_model.objects.defer(
+                "geometry", *SIMPLIFIED_GEOMETRY_FIELDS
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
 @admin.register(Cluster)
 class ClusterAdmin(SortableAdminMixin, admin.ModelAdmin):
     list_display = ["id", "name"]
@@ -75,12 +121,48 @@ class PMTilesDatasetAdmin(admin.ModelAdmin):
 class VectorDatasetAdmin(admin.ModelAdmin):
     list_display = ["id", "name", "cluster", "type", "updated"]
     list_filter = ["cluster", "type"]
+    actions = ["build_pmtiles"]
+
+    @admin.action(description="Build PMTiles archive for dataset")
+    def build_pmtiles(self, request, queryset):
+        # Built by the import worker: large datasets take too long for a request
+        jobs = [
+            ImportJob.objects.create(
+                kind="pmtiles",
+                original_name=f"PMTiles of {dataset.name}",
+                vector_dataset=dataset,
+                created_by=request.user,
+            )
+            for dataset in queryset
+        ]
+        messages.success(request, f"Queued {len(jobs)} PMTiles build(s).")
+        return redirect(import_progress_url(jobs))
 
 
 @admin.register(VectorItem)
-class VectorItemAdmin(admin.GISModelAdmin):
+class VectorItemAdmin(RegionItemAdminMixin, admin.GISModelAdmin):
     list_display = ["id", "dataset", "name", "attribute", "province", "area_council"]
-    list_filter = ["dataset", "province", "area_council"]
+    list_filter = [
+        "dataset",
+        ("province", RegionListFilter),
+        ("area_council", RegionListFilter),
+    ]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        datasets = {obj.dataset_id}
+        if change and "dataset" in form.changed_data:
+            datasets.add(form.initial["dataset"])
+        invalidate_vector_items(datasets)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_vector_items([obj.dataset_id])
+
+    def delete_queryset(self, request, queryset):
+        datasets = set(queryset.values_list("dataset", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        invalidate_vector_items(datasets)
 
     def get_urls(self):
         urls = super().get_urls()
@@ -104,69 +186,21 @@ class VectorItemAdmin(admin.GISModelAdmin):
             if form.is_valid():
                 uploaded_file = request.FILES["file"]
 
-                # Check if the file is a CSV
-                if not uploaded_file.name.endswith(".geojson"):
+                if not uploaded_file.name.endswith(
+                    (".geojson",) + NEWLINE_DELIMITED_GEOJSON_EXTENSIONS
+                ):
                     messages.error(request, "Please upload a GeoJSON file")
                     return redirect("admin:datasets_vectoritem_import_file")
 
-                try:
-                    decoded_file = TextIOWrapper(uploaded_file.file, encoding="utf-8")
-                    geojson_content = json.loads(decoded_file.read())
-
-                    created_count = 0
-                    error_count = 0
-
-                    for item in geojson_content["features"]:
-                        metadata = GeoJSONProperties(item["properties"])
-                        try:
-                            province = (
-                                Province.objects.filter(
-                                    name__iexact=metadata.province.strip()
-                                ).first()
-                                if metadata.province
-                                else None
-                            )
-                            area_council = (
-                                AreaCouncil.objects.filter(
-                                    name__iexact=metadata.area_council.strip()
-                                ).first()
-                                if metadata.province
-                                else None
-                            )
-                            attribute = (
-                                metadata.attribute.strip()
-                                if metadata.attribute
-                                else None
-                            )
-                            VectorItem.objects.create(
-                                dataset=form.cleaned_data["dataset"],
-                                metadata=metadata.properties,
-                                name=metadata.name.strip() if metadata.name else None,
-                                ref=metadata.ref,
-                                attribute=attribute,
-                                province=province,
-                                area_council=area_council,
-                                geometry=GEOSGeometry(json.dumps(item["geometry"])),
-                            )
-                            created_count += 1
-                        except Exception as e:
-                            print(e)
-                            error_count += 1
-
-                    if created_count > 0:
-                        messages.success(
-                            request, f"Successfully created {created_count} new records"
-                        )
-
-                    if error_count > 0:
-                        messages.warning(
-                            request, f"Failed to create {error_count} items."
-                        )
-
-                except Exception as e:
-                    messages.error(request, f"Error processing GeoJSON: {str(e)}")
-
-                return redirect("admin:datasets_vectoritem_import_file")
+                job = ImportJob.objects.create(
+                    kind="vector",
+                    file=uploaded_file,
+                    original_name=uploaded_file.name,
+                    vector_dataset=form.cleaned_data["dataset"],
+                    created_by=request.user,
+                )
+                messages.success(request, f"Queued {uploaded_file.name} for import.")
+                return redirect(import_progress_url([job]))
         else:
             form = GeoJSONUploadForm()
 
@@ -186,8 +220,7 @@ class TabularDatasetAdmin(admin.ModelAdmin):
 
     @admin.action(description="Clean redundant TabularItems for dataset")
     def clean_redundant_items(self, request, queryset):
-        for dataset in queryset:
-            clean_redundant_tabular_items(dataset)
+        clean_redundant_tabular_items(queryset)
 
         dataset_names = list(queryset.values_list("name", flat=True))
         if len(dataset_names) == 1:
@@ -200,7 +233,7 @@ class TabularDatasetAdmin(admin.ModelAdmin):
 
 
 @admin.register(TabularItem)
-class TabularItemAdmin(admin.GISModelAdmin):
+class TabularItemAdmin(RegionItemAdminMixin, admin.GISModelAdmin):
     list_display = [
         "id",
         "dataset",
@@ -214,8 +247,8 @@ class TabularItemAdmin(admin.GISModelAdmin):
         "dataset__cluster",
         "dataset",
         YearListFilter,
-        "province",
-        "area_council",
+        ("province", RegionListFilter),
+        ("area_council", RegionListFilter),
         "attribute",
     ]
 
@@ -223,6 +256,24 @@ class TabularItemAdmin(admin.GISModelAdmin):
     def year_column(self, obj):
         return obj.date.year if obj.date else None
 
+    def save_model(self, request, obj, form, change):
+        # Recomputed by the next upsert import of the dataset
+        obj.natural_key = None
+        # The aggregate group the item leaves, as well as the one it joins
+        groups = tabular_aggregate_groups(TabularItem.objects.filter(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        groups.add(tabular_aggregate_group(obj))
+        refresh_tabular_aggregates({group[0] for group in groups}, groups)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_tabular_aggregates([obj.dataset_id], [tabular_aggregate_group(obj)])
+
+    def delete_queryset(self, request, queryset):
+        groups = tabular_aggregate_groups(queryset)
+        super().delete_queryset(request, queryset)
+        refresh_tabular_aggregates({group[0] for group in groups}, groups)
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -255,6 +306,7 @@ class TabularItemAdmin(admin.GISModelAdmin):
             pairs = []
             format_style = request.POST.get("format_style", "long")
             year = int(request.POST.get("year") or 2024)
+            upsert = request.POST.get("upsert") == "true"
             try:
                 file_count = int(request.POST.get("file_count", 0))
             except ValueError:
@@ -278,9 +330,7 @@ class TabularItemAdmin(admin.GISModelAdmin):
                     "Please add at least one file and select a dataset for it.",
                 )
             else:
-                total_created = 0
-                total_errors = 0
-                first_error = None
+                jobs = []
                 for uploaded_file, dataset in pairs:
                     if not uploaded_file.name.endswith(".csv"):
                         messages.error(
@@ -289,48 +339,24 @@ class TabularItemAdmin(admin.GISModelAdmin):
                             "Only CSV files are accepted.",
                         )
                         continue
-                    try:
-                        decoded_file = TextIOWrapper(
-                            uploaded_file.file, encoding="utf-8"
+                    jobs.append(
+                        ImportJob.objects.create(
+                            kind="tabular",
+                            file=uploaded_file,
+                            original_name=uploaded_file.name,
+                            tabular_dataset=dataset,
+                            format_style=format_style,
+                            year=year,
+                            upsert=upsert,
+                            created_by=request.user,
                         )
-                        reader = csv.DictReader(decoded_file)
-                        created_count = 0
-                        error_count = 0
-                        if format_style == "wide":
-                            created_count, error_count, err = (
-                                import_wide_format_csv(reader, dataset, year)
-                            )
-                            if err and first_error is None:
-                                first_error = err
-                        else:
-                            for row in reader:
-                                try:
-                                    csv_row = CSVRow(row)
-                                    create_tabular_item(csv_row, dataset)
-                                    created_count += 1
-                                except Exception as e:
-                                    error_count += 1
-                                    if first_error is None:
-                                        first_error = str(e)
-                        total_created += created_count
-                        total_errors += error_count
-                    except Exception as e:
-                        messages.error(
-                            request,
-                            f"Error processing '{uploaded_file.name}': {str(e)}",
-                        )
-                if total_created > 0:
+                    )
+                if jobs:
                     messages.success(
-                        request,
-                        f"Successfully created {total_created} new records",
+                        request, f"Queued {len(jobs)} file(s) for import."
                     )
-                if total_errors > 0:
-                    msg = f"Failed to create {total_errors} items."
-                    if first_error:
-                        msg += f" First error: {first_error}"
-                    messages.warning(request, msg)
-                if pairs:
-                    return redirect(upload_url)
+                    return redirect(import_progress_url(jobs))
+                return redirect(upload_url)
 
         context = {
             "opts": self.model._meta,
@@ -339,3 +365,100 @@ class TabularItemAdmin(admin.GISModelAdmin):
             "upload_url": upload_url,
         }
         return render(request, "admin/csv_import.html", context)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "original_name",
+        "kind",
+        "dataset",
+        "status",
+        "rows_processed",
+        "created_count",
+        "error_count",
+        "created",
+        "finished",
+    ]
+    list_filter = ["kind", "status"]
+    readonly_fields = [
+        "kind",
+        "file",
+        "original_name",
+        "tabular_dataset",
+        "vector_dataset",
+        "format_style",
+        "year",
+        "upsert",
+        "status",
+        "rows_processed",
+        "created_count",
+        "error_count",
+        "duplicates_deleted",
+        "first_error",
+        "created_by",
+        "created",
+        "started",
+        "finished",
+        "attempts",
+        "heartbeat",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "progress/",
+                self.admin_site.admin_view(self.progress_view),
+                name="datasets_importjob_progress",
+            ),
+            path(
+                "progress/status/",
+                self.admin_site.admin_view(self.progress_status_view),
+                name="datasets_importjob_progress_status",
+            ),
+        ]
+        return custom_urls + urls
+
+    def get_requested_jobs(self, request):
+        ids = [i for i in request.GET.get("ids", "").split(",") if i.isdigit()]
+        return ImportJob.objects.filter(pk__in=ids).select_related(
+            "tabular_dataset", "vector_dataset"
+        )
+
+    def progress_view(self, request):
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import progress",
+            "jobs": self.get_requested_jobs(request),
+            "status_url": reverse("admin:datasets_importjob_progress_status"),
+            "ids": request.GET.get("ids", ""),
+        }
+        return render(request, "admin/datasets/importjob/progress.html", context)
+
+    def progress_status_view(self, request):
+        jobs = [
+            {
+                "id": job.pk,
+                "status": job.status,
+                "status_display": job.get_status_display(),
+                "rows_processed": job.rows_processed,
+                "created_count": job.created_count,
+                "error_count": job.error_count,
+                "first_error": job.first_error,
+            }
+            for job in self.get_requested_jobs(request)
+        ]
+        totals = {
+            "finished": sum(job["status"] in ("done", "failed") for job in jobs),
+            "count": len(jobs),
+            "rows_processed": sum(job["rows_processed"] for job in jobs),
+            "created_count": sum(job["created_count"] for job in jobs),
+            "error_count": sum(job["error_count"] for job in jobs),
+        }
+        return JsonResponse({"jobs": jobs, "totals": totals})
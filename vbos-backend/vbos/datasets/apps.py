@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class DatasetsConfig(AppConfig):
+    name = "vbos.datasets"
+
+    def ready(self):
+        from . import checks  # noqa: F401
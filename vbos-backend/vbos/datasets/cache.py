@@ -0,0 +1,125 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+NAMESPACE_VERSION_KEY = "datasets:version:{}"
+RESPONSE_CACHE_KEY = "datasets:response:{}"
+
+
+def _version_key(namespace: str) -> str:
+    return NAMESPACE_VERSION_KEY.format(namespace)
+
+
+def _new_version() -> int:
+    # Versions are the time of the last change, in nanoseconds: a version key lost
+    # to eviction or a restart never comes back with a value that old cache entries
+    # were stored under, and versions double as Last-Modified timestamps.
+    return time.time_ns()
+
+
+def namespace_versions(*namespaces: str) -> list:
+    """Current version of each namespace, fetched in one cache round trip."""
+    keys = [_version_key(i) for i in namespaces]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def namespace_version(namespace: str) -> int:
+    return namespace_versions(namespace)[0]
+
+
+def bump_namespace(*namespaces: str):
+    """Invalidate every cache entry stored under the current version of ``namespaces``."""
+    if namespaces:
+        version = _new_version()
+        cache.set_many({_version_key(i): version for i in namespaces}, None)
+
+
+def dataset_namespace(kind: str, pk) -> str:
+    """Namespace for the items of one dataset, e.g. 'tabular:12'."""
+    return f"{kind}:{pk}"
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with an ETag and Last-Modified derived from the URL (with
+    normalised query parameters) and the current version of ``cache_namespaces``,
+    and with 304 Not Modified when the client's copy is current, before anything
+    is queried or serialised. Namespaces may contain URL kwargs placeholders, e.g.
+    'tabular:{pk}'. Views build the response in get_fresh_response(), instead
+    of get().
+    """
+
+    cache_namespaces = ()
+
+    def get_namespace_versions(self) -> list:
+        if not hasattr(self, "_namespace_versions"):
+            self._namespace_versions = namespace_versions(
+                *(i.format(**self.kwargs) for i in self.cache_namespaces)
+            )
+        return self._namespace_versions
+
+    def get_request_fingerprint(self, request) -> str:
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        # The host is part of it as pagination links are absolute URLs
+        url = f"{request.scheme}://{request.get_host()}{request.path}?{query}"
+        versions = "-".join(str(i) for i in self.get_namespace_versions())
+        return hashlib.md5(f"{url}|{versions}".encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        etag = quote_etag(self.get_request_fingerprint(request))
+        last_modified = max(self.get_namespace_versions(), default=0) // 10**9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.get_cached_response(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        # A 304 carries the same validators as the 200 it stands for (RFC 9110)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        # Without it browsers may reuse the response without revalidating it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_cached_response(self, request, *args, **kwargs):
+        return self.get_fresh_response(request, *args, **kwargs)
+
+    def get_fresh_response(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Also cache the serialised payload of successful responses, keyed on the
+    request fingerprint, so bump_namespace() invalidates only the views depending
+    on the bumped namespaces.
+
+    Unlike cache_page, the cache is consulted from the handler, after DRF has
+    authenticated the request and checked its permissions, and the payload does
+    not depend on the user, so one entry safely serves every client.
+    """
+
+    cache_timeout = 60 * 15  # 15 min cache
+
+    def get_cached_response(self, request, *args, **kwargs):
+        key = RESPONSE_CACHE_KEY.format(self.get_request_fingerprint(request))
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = self.get_fresh_response(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose content is not seen by the other processes
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_process_local_cache() -> bool:
+    return settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The namespace versions behind ETags and cached responses are bumped by the
+    import worker, so the web processes must see its cache.
+    """
+    if not is_process_local_cache():
+        return []
+    return [
+        Error(
+            "The default cache is not shared between processes, so imports run "
+            "by process_import_jobs never invalidate the API responses and ETags "
+            "of the web processes.",
+            hint="Set DJANGO_CACHE to database, file or redis for both the web "
+            "and the worker processes.",
+            id="datasets.E001",
+        )
+    ]
@@ -0,0 +1,87 @@
+import json
+from typing import List
+
+from django.db.models import CharField, F, Func
+from openpyxl import Workbook
+from rest_framework.utils.encoders import JSONEncoder
+
+from .utils import chunked
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+TABULAR_XLSX_COLUMNS = {
+    "id": "id",
+    "attribute": "attribute",
+    "date": "date",
+    "value": "value",
+    "province": "province__name",
+    "area_council": "area_council__name",
+}
+
+
+def encode_json(data) -> str:
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False)
+
+
+def iter_json_array(objects, encode, head="[", tail="]", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield a JSON document whose body is the array of ``encode(obj)``, the JSON text
+    of each of ``objects``, one string per chunk, wrapped in ``head`` and ``tail``.
+    """
+    yield head
+    separator = ""
+    for chunk in chunked(objects, chunk_size):
+        yield separator + ",".join(encode(i) for i in chunk)
+        separator = ","
+    yield tail
+
+
+def iter_ndjson(objects, encode, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield ``encode(obj)``, the JSON text of each of ``objects``, one per line."""
+    for chunk in chunked(objects, chunk_size):
+        yield "".join(encode(i) + "\n" for i in chunk)
+
+
+def tabular_metadata_keys(queryset) -> List[str]:
+    """Sorted keys found in the metadata of a TabularItem queryset, in one query."""
+    return list(
+        queryset.annotate(
+            metadata_type=Func(
+                F("metadata"), function="jsonb_typeof", output_field=CharField()
+            )
+        )
+        .filter(metadata_type="object")
+        .annotate(
+            key=Func(
+                F("metadata"), function="jsonb_object_keys", output_field=CharField()
+            )
+        )
+        .order_by("key")
+        .values_list("key", flat=True)
+        .distinct()
+    )
+
+
+def _xlsx_metadata_cell(value):
+    return "" if value is None else str(value)
+
+
+def write_tabular_xlsx(queryset, file):
+    """
+    Write a TabularItem queryset to ``file`` as a write-only XLSX workbook: one
+    column per TABULAR_XLSX_COLUMNS entry and per metadata key, rows read from a
+    server-side cursor so memory use doesn't grow with the row count.
+    """
+    keys = tabular_metadata_keys(queryset)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([*TABULAR_XLSX_COLUMNS, *keys])
+
+    rows = queryset.values_list(
+        *TABULAR_XLSX_COLUMNS.values(), "metadata"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for *values, metadata in rows:
+        if not isinstance(metadata, dict):
+            metadata = {}
+        sheet.append([*values, *(_xlsx_metadata_cell(metadata.get(k)) for k in keys)])
+    workbook.save(file)
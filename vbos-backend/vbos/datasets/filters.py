@@ -3,6 +3,7 @@ from django_filters import (
     DateFromToRangeFilter,
     FilterSet,
     ModelChoiceFilter,
+    NumberFilter,
     OrderingFilter,
 )
 
@@ -12,6 +13,7 @@ from .models import (
     PMTilesDataset,
     Province,
     RasterDataset,
+    TabularAggregate,
     TabularDataset,
     TabularItem,
     VectorDataset,
@@ -135,3 +137,22 @@ class VectorItemFilter(DataItemsBaseFilter):
             "name",
             "ref",
         ]
+
+
+class TabularAggregateFilter(FilterSet):
+    year = NumberFilter()
+    attribute = CharFilter(lookup_expr="iexact")
+    province = ModelChoiceFilter(
+        field_name="province__name",
+        to_field_name="name__iexact",
+        queryset=Province.objects.all(),
+    )
+    area_council = ModelChoiceFilter(
+        field_name="area_council__name",
+        to_field_name="name__iexact",
+        queryset=AreaCouncil.objects.all(),
+    )
+
+    class Meta:
+        model = TabularAggregate
+        fields = ["year", "attribute", "province", "area_council"]
@@ -75,7 +75,11 @@ class CSVUploadForm(forms.Form):
 
 
 class GeoJSONUploadForm(forms.Form):
-    file = forms.FileField(label="File")
+    file = forms.FileField(
+        label="File",
+        help_text="GeoJSON FeatureCollection (.geojson) or newline-delimited GeoJSON "
+        "(.geojsonl, .geojsons, .ndjson)",
+    )
     dataset = forms.ModelChoiceField(
         queryset=VectorDataset.objects.all(), empty_label="Select a dataset"
     )
@@ -0,0 +1,258 @@
+import csv
+import logging
+import threading
+import time
+from datetime import timedelta
+from io import TextIOWrapper
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImportJob
+from .tiles import build_vector_pmtiles
+from .utils import (
+    NEWLINE_DELIMITED_GEOJSON_EXTENSIONS,
+    import_geojson,
+    import_long_format_csv,
+    import_wide_format_csv,
+    refresh_tabular_aggregates,
+)
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between two progress updates of a job
+PROGRESS_INTERVAL = 1
+# Seconds between two heartbeats of a running job, and without one after which
+# the worker running it is considered gone
+HEARTBEAT_INTERVAL = 30
+STALE_JOB_TIMEOUT = 10 * 60
+# Jobs whose worker stopped this many times are failed instead of requeued
+MAX_JOB_ATTEMPTS = 2
+
+
+def _write_progress(job_id: int, **fields):
+    """
+    Update an ImportJob from a separate thread, and so a separate DB connection,
+    so pollers can see the progress while the import transaction is still open.
+    """
+
+    def update():
+        try:
+            ImportJob.objects.filter(pk=job_id).update(**fields)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=update)
+    thread.start()
+    thread.join()
+
+
+class ProgressReporter:
+    """Progress callback for the importers that records it on the ImportJob."""
+
+    def __init__(self, job: ImportJob, interval: float = PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.last_update = time.monotonic()
+
+    def __call__(self, rows_processed, created_count, error_count, first_error):
+        now = time.monotonic()
+        if now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        _write_progress(
+            self.job.pk,
+            rows_processed=rows_processed,
+            created_count=created_count,
+            error_count=error_count,
+            first_error=first_error or "",
+        )
+
+
+class Heartbeat:
+    """
+    Context manager updating the heartbeat of a running job every ``interval``
+    seconds from a separate thread, for as long as the job runs, so that
+    requeue_stale_jobs() can tell it from a job whose worker died.
+    """
+
+    def __init__(self, job: ImportJob, interval: float = HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                ImportJob.objects.filter(pk=self.job.pk).update(
+                    heartbeat=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def job_dataset(job: ImportJob):
+    """(kind, dataset id) of the dataset a job imports into, or builds from."""
+    if job.kind in ("vector", "pmtiles"):
+        return "vector", job.vector_dataset_id
+    return job.kind, job.tabular_dataset_id
+
+
+def claim_next_job(busy_datasets=()):
+    """
+    Mark the oldest pending job as running and return it, or None if there is none.
+    Jobs into one of ``busy_datasets`` (see job_dataset()) are left pending, so
+    that two imports into the same dataset never run at the same time.
+    """
+    busy = {"tabular": [], "vector": []}
+    for kind, dataset_id in busy_datasets:
+        busy[kind].append(dataset_id)
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .exclude(kind="tabular", tabular_dataset__in=busy["tabular"])
+            .exclude(
+                kind__in=("vector", "pmtiles"), vector_dataset__in=busy["vector"]
+            )
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started = job.heartbeat = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started", "heartbeat", "attempts"])
+    return job
+
+
+def delete_job_file(job: ImportJob):
+    """Delete the upload of a finished job: it is only needed to run the job."""
+    if job.file:
+        try:
+            job.file.delete(save=False)
+        except Exception:
+            logger.exception("Failed to delete the file of import job %s", job.pk)
+
+
+def requeue_stale_jobs(timeout: float = STALE_JOB_TIMEOUT):
+    """
+    Put the running jobs without a heartbeat for ``timeout`` seconds, whose
+    worker crashed or was restarted, back in the queue. Imports run in a single
+    transaction, so the interrupted run left nothing behind. Jobs which already
+    had MAX_JOB_ATTEMPTS are marked failed instead, so that a job killing its
+    worker is not retried forever. Returns (requeued_count, failed_count).
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=timeout)
+    stale = ImportJob.objects.filter(status="running").filter(
+        Q(heartbeat__lt=cutoff) | Q(heartbeat__isnull=True, started__lt=cutoff)
+    )
+    requeued_count = failed_count = 0
+    for job in stale:
+        if job.attempts >= MAX_JOB_ATTEMPTS:
+            job.status = "failed"
+            job.first_error = (
+                f"The import worker stopped while running this job "
+                f"{job.attempts} times."
+            )
+            job.finished = now
+            delete_job_file(job)
+            failed_count += 1
+        else:
+            job.status = "pending"
+            job.started = job.heartbeat = None
+            job.rows_processed = job.created_count = job.error_count = 0
+            job.first_error = ""
+            requeued_count += 1
+        job.save()
+    return requeued_count, failed_count
+
+
+def run_import(job: ImportJob, progress=None, stats=None):
+    """
+    Run the importer matching the job. Returns (created_count, error_count,
+    first_error); tabular importers also fill ``stats``.
+    PMTiles builds count the built PMTilesDataset as created.
+    """
+    if job.kind == "pmtiles":
+        build_vector_pmtiles(job.vector_dataset)
+        return 1, 0, None
+
+    with job.file.open("rb") as file:
+        if job.kind == "vector":
+            return import_geojson(
+                file,
+                job.vector_dataset,
+                progress=progress,
+                newline_delimited=job.original_name.endswith(
+                    NEWLINE_DELIMITED_GEOJSON_EXTENSIONS
+                ),
+            )
+
+        reader = csv.DictReader(TextIOWrapper(file, encoding="utf-8"))
+        if job.format_style == "wide":
+            return import_wide_format_csv(
+                reader,
+                job.tabular_dataset,
+                job.year or 2024,
+                progress=progress,
+                upsert=job.upsert,
+                stats=stats,
+            )
+        return import_long_format_csv(
+            reader,
+            job.tabular_dataset,
+            progress=progress,
+            upsert=job.upsert,
+            stats=stats,
+        )
+
+
+def process_import_job(job: ImportJob):
+    """Run a claimed job and record its outcome."""
+    try:
+        stats = {}
+        with Heartbeat(job):
+            created_count, error_count, first_error = run_import(
+                job, ProgressReporter(job), stats
+            )
+            duplicates_deleted = stats.get("duplicates_deleted", 0)
+            if job.kind == "tabular" and (created_count or duplicates_deleted):
+                # Duplicates deleted by an upsert may belong to any group
+                groups = None if duplicates_deleted else stats["groups"]
+                refresh_tabular_aggregates([job.tabular_dataset_id], groups)
+        job.status = "done"
+        job.created_count = created_count
+        job.error_count = error_count
+        job.first_error = first_error or ""
+        # Rows left unchanged by an upsert are neither created nor failed
+        job.rows_processed = stats.get("rows_processed", created_count + error_count)
+        job.duplicates_deleted = duplicates_deleted
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = "failed"
+        job.first_error = str(e)
+    job.finished = timezone.now()
+    delete_job_file(job)
+    job.save()
+    return job
+
+
+def process_import_job_in_thread(job: ImportJob):
+    """Run process_import_job() in a pool thread, then close its DB connection."""
+    try:
+        return process_import_job(job)
+    finally:
+        connection.close()
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ...models import VectorDataset
+from ...utils import assign_vector_item_regions
+
+
+class Command(BaseCommand):
+    help = """Assign the province and area council of VectorItems from the region
+    boundaries containing them."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            type=int,
+            action="append",
+            dest="datasets",
+            help="Only assign the items of the VectorDataset with this id. Can be repeated.",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Also replace the regions items already have.",
+        )
+
+    def handle(self, *args, **options):
+        datasets = VectorDataset.objects.all()
+        if options["datasets"]:
+            datasets = datasets.filter(id__in=options["datasets"])
+
+        for dataset in datasets:
+            provinces, area_councils = assign_vector_item_regions(
+                dataset, overwrite=options["overwrite"]
+            )
+            self.stdout.write(
+                f"Assigned {provinces} provinces and {area_councils} area councils "
+                f"to {dataset.name} items."
+            )
@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ...models import Cluster, VectorDataset, VectorItem
+
+# Random points over Vanuatu
+INSERT_POINTS_SQL = """
+INSERT INTO datasets_vectoritem (dataset_id, name, geometry, metadata)
+SELECT
+    %(dataset)s,
+    'Benchmark ' || i,
+    ST_SetSRID(ST_MakePoint(166.5 + random() * 4, -20.3 + random() * 7.3), 4326),
+    '{}'::jsonb
+FROM generate_series(1, %(count)s) AS i
+"""
+INDEX_NAME = "datasets_vec_ds_geom_gist"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = """Time the bbox query of the vector data endpoint on synthetic datasets of
+    each size, next to another dataset of the same size. Everything is created in a
+    transaction that is rolled back; run it against a development database."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Number of features of the benchmarked dataset.",
+        )
+        parser.add_argument(
+            "--bbox",
+            default="168.2,-17.8,168.4,-17.6",
+            help="xmin,ymin,xmax,ymax of the queried area, as the in_bbox parameter.",
+        )
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        bbox = Polygon.from_bbox([float(i) for i in options["bbox"].split(",")])
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    result = self.benchmark(
+                        size, bbox, options["page_size"], options["repeat"]
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+            count, median, uses_index = result
+            self.stdout.write(
+                f"{size} features: {count} in bbox, median {median:.1f} ms "
+                f"({'uses' if uses_index else 'does not use'} {INDEX_NAME})."
+            )
+
+    def benchmark(self, size, bbox, page_size, repeat):
+        cluster, _ = Cluster.objects.get_or_create(name="Benchmark")
+        dataset, other = [
+            VectorDataset.objects.create(name=name, cluster=cluster)
+            for name in ["Benchmark", "Benchmark other"]
+        ]
+        with connection.cursor() as cursor:
+            for i in [dataset, other]:
+                cursor.execute(INSERT_POINTS_SQL, {"dataset": i.pk, "count": size})
+            cursor.execute("ANALYZE datasets_vectoritem")
+
+        # Same filters as VectorDatasetDataView with InBBoxFilter and a page
+        queryset = VectorItem.objects.filter(dataset=dataset, geometry__contained=bbox)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - start) * 1000)
+        uses_index = INDEX_NAME in queryset[:page_size].explain()
+        return count, statistics.median(timings), uses_index
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import VectorDataset
+from ...tiles import PMTILES_MAX_ZOOM, PMTILES_MIN_ZOOM, build_vector_pmtiles
+
+
+class Command(BaseCommand):
+    help = """Build a PMTiles archive from each VectorDataset, save it to the default
+    storage and create or update the matching PMTilesDataset."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "datasets", nargs="+", type=int, help="Ids of the VectorDatasets."
+        )
+        parser.add_argument("--min-zoom", type=int, default=PMTILES_MIN_ZOOM)
+        parser.add_argument("--max-zoom", type=int, default=PMTILES_MAX_ZOOM)
+
+    def handle(self, *args, **options):
+        if not 0 <= options["min_zoom"] <= options["max_zoom"]:
+            raise CommandError("--min-zoom must be between 0 and --max-zoom.")
+
+        datasets = VectorDataset.objects.filter(id__in=options["datasets"])
+        missing = set(options["datasets"]) - {i.pk for i in datasets}
+        if missing:
+            ids = ", ".join(str(i) for i in sorted(missing))
+            raise CommandError(f"VectorDataset not found: {ids}.")
+
+        for dataset in datasets:
+            try:
+                pmtiles = build_vector_pmtiles(
+                    dataset, options["min_zoom"], options["max_zoom"]
+                )
+            except ValueError as e:
+                self.stderr.write(str(e))
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(f"Built {pmtiles.url} for {dataset.name}.")
+            )
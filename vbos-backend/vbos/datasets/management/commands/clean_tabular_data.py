@@ -7,10 +7,29 @@ from ...utils import clean_redundant_tabular_items
 class Command(BaseCommand):
     help = """Clean TabularItem data, removing entries that are redundant."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            type=int,
+            action="append",
+            dest="datasets",
+            help="Only clean the TabularDataset with this id. Can be repeated.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many items would be removed without deleting them.",
+        )
+
     def handle(self, *args, **options):
         datasets = TabularDataset.objects.all()
+        if options["datasets"]:
+            datasets = datasets.filter(id__in=options["datasets"])
 
-        for d in datasets:
-            clean_redundant_tabular_items(d)
+        counts = clean_redundant_tabular_items(datasets, dry_run=options["dry_run"])
 
-            self.stdout.write(f"Removed redundant {d.name} tabular items.")
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        for d in datasets:
+            self.stdout.write(
+                f"{verb} {counts.get(d.id, 0)} redundant {d.name} tabular items."
+            )
@@ -1,14 +1,16 @@
+from django.conf import settings
 from django.core.cache import cache
 from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
-    help = "Clear the Django cache. Use after admin changes (e.g. cluster add/delete) that are not reflected in the API."
+    help = "Clear the Django cache. Admin changes invalidate the affected cached responses automatically."
 
     def handle(self, *args, **options):
         cache.clear()
         self.stdout.write(self.style.SUCCESS("Cache cleared successfully."))
-        self.stdout.write(
-            "If using gunicorn with multiple workers and LocMemCache, also run: "
-            "docker-compose restart web"
-        )
+        if "LocMemCache" in settings.CACHES["default"]["BACKEND"]:
+            self.stdout.write(
+                "LocMemCache is per process: only this process's cache was cleared. "
+                "Set DJANGO_CACHE=database or file to share the cache between workers."
+            )
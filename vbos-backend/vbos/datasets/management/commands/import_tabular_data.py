@@ -2,7 +2,11 @@ import csv
 
 from django.core.management.base import BaseCommand
 
-from ...utils import CSVRow, create_tabular_item, get_dataset
+from ...utils import (
+    TABULAR_IMPORT_CHUNK_SIZE,
+    import_long_format_csv,
+    refresh_tabular_aggregates,
+)
 
 
 class Command(BaseCommand):
@@ -10,24 +14,46 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("filename", nargs=1, type=str)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=TABULAR_IMPORT_CHUNK_SIZE,
+            help="Number of rows written per bulk insert.",
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help="Update the values of rows already imported instead of adding them again.",
+        )
 
     def handle(self, *args, **options):
         filename = options["filename"][0]
 
         with open(filename) as file:
             reader = csv.DictReader(file)
-            created_count = 0
-            error_count = 0
-
-            for row in reader:
-                try:
-                    dataset = get_dataset(row)
-                    csv_row = CSVRow(row)
-                    create_tabular_item(csv_row, dataset)
-
-                    created_count += 1
-                except Exception as e:
-                    print(f"{e}: {row}")
-                    error_count += 1
-
-            self.stdout.write(f"{created_count} tabular items created from {filename}.")
+            datasets = {}
+            stats = {}
+            created_count, error_count, first_error = import_long_format_csv(
+                reader,
+                chunk_size=options["chunk_size"],
+                datasets=datasets,
+                upsert=options["upsert"],
+                stats=stats,
+            )
+            # Duplicates deleted by an upsert may belong to any group
+            refresh_tabular_aggregates(
+                [d for d in datasets.values() if not isinstance(d, Exception)],
+                None if stats["duplicates_deleted"] else stats["groups"],
+            )
+
+            if error_count:
+                self.stderr.write(
+                    f"Failed to create {error_count} items. First error: {first_error}"
+                )
+            verb = "created or updated" if options["upsert"] else "created"
+            self.stdout.write(f"{created_count} tabular items {verb} from {filename}.")
+            if stats["duplicates_deleted"]:
+                self.stdout.write(
+                    f"{stats['duplicates_deleted']} duplicates of existing items "
+                    "deleted."
+                )
@@ -0,0 +1,141 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...checks import is_process_local_cache
+from ...jobs import (
+    claim_next_job,
+    job_dataset,
+    process_import_job,
+    process_import_job_in_thread,
+    requeue_stale_jobs,
+)
+from ...warmup import warm_cache
+
+
+class Command(BaseCommand):
+    help = """Process the CSV/GeoJSON imports queued through the admin. Up to --workers
+    jobs run at the same time, each in its own thread, DB connection and
+    transaction; jobs into the same dataset are run one after another."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending jobs and exit instead of polling for new ones.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between checks for new jobs.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMPORT_WORKERS,
+            help="Number of jobs processed concurrently. With 1, jobs are processed "
+            "in the main thread.",
+        )
+
+    def handle(self, *args, **options):
+        if is_process_local_cache() and not options["once"]:
+            self.stderr.write(
+                "The default cache is not shared with the web processes: they will "
+                "keep serving the data from before the imports. Set DJANGO_CACHE to "
+                "database, file or redis."
+            )
+        if not settings.CACHE_WARM_URL:
+            self.stderr.write(
+                "DJANGO_CACHE_WARM_URL is not set: the cache will not be warmed after "
+                "imports."
+            )
+        # Jobs left running by a worker that crashed or was restarted
+        requeued_count, failed_count = requeue_stale_jobs()
+        if requeued_count or failed_count:
+            self.stdout.write(
+                f"Requeued {requeued_count} and failed {failed_count} interrupted "
+                "job(s)."
+            )
+        self.reset_batch()
+        workers = max(1, options["workers"])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            while True:
+                while len(running) < workers:
+                    job = claim_next_job(
+                        busy_datasets={job_dataset(i) for i in running.values()}
+                    )
+                    if job is None:
+                        break
+                    if self.batch_start is None:
+                        self.batch_start = time.monotonic()
+                    self.stdout.write(
+                        f"Processing {job.original_name} (job {job.pk})..."
+                    )
+                    if workers == 1:
+                        self.report(process_import_job(job))
+                    else:
+                        future = executor.submit(process_import_job_in_thread, job)
+                        running[future] = job
+
+                if running:
+                    done, _ = wait(
+                        running,
+                        timeout=options["poll_interval"],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        job = running.pop(future)
+                        try:
+                            self.report(future.result())
+                        except Exception as e:
+                            self.batch_jobs += 1
+                            self.batch_failed_jobs += 1
+                            self.stderr.write(f"Job {job.pk} crashed: {e}")
+                    continue
+
+                if self.batch_start is not None:
+                    self.finish_batch()
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                close_old_connections()
+
+    def reset_batch(self):
+        self.batch_start = None
+        self.batch_jobs = 0
+        self.batch_failed_jobs = 0
+        self.batch_created = 0
+        self.batch_errors = 0
+
+    def report(self, job):
+        self.batch_jobs += 1
+        if job.status == "failed":
+            self.batch_failed_jobs += 1
+        self.batch_created += job.created_count
+        self.batch_errors += job.error_count
+        self.stdout.write(
+            f"{job.original_name}: {job.status}, {job.created_count} created, "
+            f"{job.error_count} failed."
+        )
+
+    def finish_batch(self):
+        """Report the jobs processed since the queue was last empty."""
+        self.stdout.write(
+            f"Processed {self.batch_jobs} job(s) in "
+            f"{time.monotonic() - self.batch_start:.1f}s: "
+            f"{self.batch_failed_jobs} job(s) failed, {self.batch_created} rows "
+            f"created, {self.batch_errors} rows failed."
+        )
+        # Re-render the responses invalidated by the imports, once the queue is
+        # drained
+        if settings.CACHE_WARM_URL:
+            try:
+                warm_cache()
+            except Exception as e:
+                self.stderr.write(f"Failed to warm the cache: {e}")
+        self.reset_batch()
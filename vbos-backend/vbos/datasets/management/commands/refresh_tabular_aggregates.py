@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from ...models import TabularDataset
+from ...utils import refresh_tabular_aggregates
+
+
+class Command(BaseCommand):
+    help = """Rebuild the per-dataset TabularAggregate summary used by the aggregates endpoint."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            type=int,
+            action="append",
+            dest="datasets",
+            help="Only refresh the TabularDataset with this id. Can be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        datasets = TabularDataset.objects.all()
+        if options["datasets"]:
+            datasets = datasets.filter(id__in=options["datasets"])
+
+        refresh_tabular_aggregates(datasets)
+        self.stdout.write(f"Refreshed aggregates for {datasets.count()} datasets.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...models import SIMPLIFICATION_TOLERANCES
+from ...utils import simplify_region_geometries
+
+
+class Command(BaseCommand):
+    help = """Recompute the simplified geometries of provinces and area councils served
+    with the ?simplify= and ?zoom= parameters."""
+
+    def handle(self, *args, **options):
+        count = simplify_region_geometries()
+        levels = ", ".join(
+            f"{level} ({tolerance})"
+            for level, tolerance in SIMPLIFICATION_TOLERANCES.items()
+        )
+        self.stdout.write(f"Simplified {count} region geometries at levels: {levels}.")
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...warmup import warm_cache
+
+
+class Command(BaseCommand):
+    help = """Pre-render the cached cluster, province, area council and cluster datasets
+    API responses. Run after deploys and imports; needs a shared cache backend
+    (DJANGO_CACHE=database or file) to benefit the web workers."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default=settings.CACHE_WARM_URL,
+            help="Scheme and host the API is requested at, as they are part of the cache keys.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["base_url"]:
+            self.stderr.write(
+                "Skipped: the API URL is unknown. Set DJANGO_CACHE_WARM_URL or pass "
+                "--base-url, as warmed responses are only served at that URL."
+            )
+            return
+        results = warm_cache(options["base_url"])
+        for path, status_code in results:
+            if status_code != 200:
+                self.stderr.write(f"{path} returned {status_code}.")
+        warmed = sum(1 for _, status_code in results if status_code == 200)
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed} cached responses."))
@@ -0,0 +1,127 @@
+import hashlib
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+COMPRESSED_CACHE_KEY = "datasets:compressed:{}"
+COMPRESSED_CACHE_TIMEOUT = 60 * 15  # 15 min cache
+# API payloads only; HTML pages embed CSRF tokens (BREACH)
+COMPRESSIBLE_CONTENT_TYPES = {
+    "application/json",
+    "application/geo+json",
+    "application/x-ndjson",
+    "application/vnd.mapbox-vector-tile",
+}
+# Brotli first: it wins on ties in Accept-Encoding
+ENCODINGS = ["br", "gzip"]
+BROTLI_QUALITY = 5
+
+
+def accepted_encoding(request):
+    """The preferred encoding of ENCODINGS in the Accept-Encoding header, or None."""
+    weights = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, *params = [i.strip() for i in part.split(";")]
+        weight = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+
+    candidates = [i for i in ENCODINGS if weights.get(i, weights.get("*", 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda i: weights.get(i, weights.get("*", 0)))
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return compress_string(content)
+
+
+def compress_stream(sequence, encoding: str):
+    if encoding == "gzip":
+        yield from compress_sequence(sequence)
+        return
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        # Flushed for each chunk, so that clients receive them as they are produced
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compressed_cache_key(etag: str, content_type: str, encoding: str) -> str:
+    key = f"{etag}|{content_type}|{encoding}"
+    return COMPRESSED_CACHE_KEY.format(hashlib.md5(key.encode()).hexdigest())
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with Brotli or gzip, following the client's
+    Accept-Encoding, when they are at least COMPRESSION_MIN_SIZE bytes long.
+    Streaming responses are compressed chunk by chunk.
+
+    Responses with an ETag are identified by it (see ConditionalGetMixin), so
+    their compressed body is cached and reused instead of compressing the same
+    content on every hit.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if (
+            content_type not in COMPRESSIBLE_CONTENT_TYPES
+            or response.has_header("Content-Encoding")
+            or (response.streaming and response.is_async)
+        ):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response.headers["Content-Length"]
+        else:
+            content = self.get_compressed_content(response, content_type, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        # The encoded body is not byte-for-byte the one the ETag was computed for
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def get_compressed_content(self, response, content_type, encoding) -> bytes:
+        etag = response.get("ETag")
+        if not etag:
+            return compress(response.content, encoding)
+
+        key = compressed_cache_key(etag, content_type, encoding)
+        content = cache.get(key)
+        if content is None:
+            content = compress(response.content, encoding)
+            cache.set(key, content, COMPRESSED_CACHE_TIMEOUT)
+        return content
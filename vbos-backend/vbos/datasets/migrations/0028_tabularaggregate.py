@@ -0,0 +1,105 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import ExtractYear
+
+
+def populate_aggregates(apps, schema_editor):
+    TabularItem = apps.get_model("datasets", "TabularItem")
+    TabularAggregate = apps.get_model("datasets", "TabularAggregate")
+    groups = (
+        TabularItem.objects.order_by()
+        .values(
+            "dataset", "province", "area_council", "attribute", year=ExtractYear("date")
+        )
+        .annotate(
+            value_sum=Sum("value"),
+            value_count=Count("id"),
+            value_min=Min("value"),
+            value_max=Max("value"),
+        )
+    )
+    TabularAggregate.objects.bulk_create(
+        (
+            TabularAggregate(
+                dataset_id=g["dataset"],
+                year=g["year"],
+                province_id=g["province"],
+                area_council_id=g["area_council"],
+                attribute=g["attribute"],
+                value_sum=g["value_sum"],
+                value_count=g["value_count"],
+                value_min=g["value_min"],
+                value_max=g["value_max"],
+            )
+            for g in groups
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0027_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TabularAggregate",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveIntegerField(null=True)),
+                (
+                    "attribute",
+                    models.CharField(blank=True, max_length=155, null=True),
+                ),
+                ("value_sum", models.FloatField(default=0)),
+                ("value_count", models.PositiveIntegerField(default=0)),
+                ("value_min", models.FloatField(null=True)),
+                ("value_max", models.FloatField(null=True)),
+                (
+                    "area_council",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datasets.areacouncil",
+                    ),
+                ),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datasets.tabulardataset",
+                    ),
+                ),
+                (
+                    "province",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datasets.province",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["dataset", "year"], name="datasets_tab_agg_ds_year_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_aggregates, reverse_code=migrations.RunPython.noop),
+    ]
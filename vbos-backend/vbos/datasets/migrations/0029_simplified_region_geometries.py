@@ -0,0 +1,78 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+from django.db.models import F, Func, Value
+
+SIMPLIFICATION_TOLERANCES = {
+    "high": 0.01,
+    "medium": 0.001,
+    "low": 0.0001,
+}
+
+
+def simplify_geometries(apps, schema_editor):
+    updates = {
+        f"geometry_simplified_{level}": Func(
+            F("geometry"),
+            Value(tolerance),
+            function="ST_SimplifyPreserveTopology",
+            output_field=django.contrib.gis.db.models.fields.GeometryField(),
+        )
+        for level, tolerance in SIMPLIFICATION_TOLERANCES.items()
+    }
+    for model_name in ["Province", "AreaCouncil"]:
+        apps.get_model("datasets", model_name).objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0028_tabularaggregate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="areacouncil",
+            name="geometry_simplified_high",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="areacouncil",
+            name="geometry_simplified_low",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="areacouncil",
+            name="geometry_simplified_medium",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="province",
+            name="geometry_simplified_high",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="province",
+            name="geometry_simplified_low",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="province",
+            name="geometry_simplified_medium",
+            field=django.contrib.gis.db.models.fields.GeometryField(
+                blank=True, editable=False, null=True, srid=4326
+            ),
+        ),
+        migrations.RunPython(simplify_geometries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0029_simplified_region_geometries"),
+    ]
+
+    operations = [
+        # Lets the integer dataset_id be a column of a GiST index
+        BtreeGistExtension(),
+        migrations.AddIndex(
+            model_name="vectoritem",
+            index=django.contrib.postgres.indexes.GistIndex(
+                fields=["dataset", "geometry"], name="datasets_vec_ds_geom_gist"
+            ),
+        ),
+    ]
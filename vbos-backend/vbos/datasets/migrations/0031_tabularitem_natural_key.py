@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0030_vectoritem_dataset_geometry_gist_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tabularitem",
+            name="natural_key",
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="tabularitem",
+            constraint=models.UniqueConstraint(
+                fields=("dataset", "natural_key"),
+                name="datasets_tabularitem_natural_key",
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="upsert",
+            field=models.BooleanField(
+                default=False,
+                help_text="Update the rows of the dataset matching the imported ones instead of appending duplicates.",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0031_tabularitem_natural_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="duplicates_deleted",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Older duplicates of existing rows deleted by an upsert import.",
+            ),
+        ),
+    ]
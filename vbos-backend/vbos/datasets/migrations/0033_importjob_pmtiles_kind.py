@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0032_importjob_duplicates_deleted"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importjob",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("tabular", "Tabular CSV"),
+                    ("vector", "Vector GeoJSON"),
+                    ("pmtiles", "Vector PMTiles build"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="importjob",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                upload_to="staging/imports/",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:50
+
+import vbos.datasets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0033_importjob_pmtiles_kind"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importjob",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                storage=vbos.datasets.models.import_storage,
+                upload_to="staging/imports/",
+            ),
+        ),
+    ]
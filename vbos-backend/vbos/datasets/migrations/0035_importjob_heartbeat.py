@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0034_importjob_file_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="attempts",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of times a worker started the job."
+            ),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="heartbeat",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Last time the worker running the job reported it was alive.",
+                null=True,
+            ),
+        ),
+    ]
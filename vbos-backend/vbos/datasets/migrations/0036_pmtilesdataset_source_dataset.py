@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datasets", "0035_importjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pmtilesdataset",
+            name="source_dataset",
+            field=models.OneToOneField(
+                blank=True,
+                help_text="Vector dataset the archive is built from.",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="pmtiles_dataset",
+                to="datasets.vectordataset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="pmtilesdataset",
+            name="file_name",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Storage name of the archive built from the source dataset.",
+                max_length=255,
+            ),
+        ),
+    ]
@@ -1,12 +1,15 @@
 from django.conf import settings
 from django.contrib.gis.db import models
-from django.core.cache import cache
+from django.contrib.postgres.indexes import GistIndex
+from django.core.files.storage import storages
 from django.core.validators import FileExtensionValidator
 from django.db.models.fields.files import default_storage
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from .cache import bump_namespace, dataset_namespace
+
 UPLOAD_TO = "staging/raster/" if settings.DEBUG else "production/raster/"
 
 TYPE_CHOICES = {
@@ -28,18 +31,53 @@ class Cluster(models.Model):
         ordering = ["order"]
 
 
-def _invalidate_cluster_cache(sender, **kwargs):
-    """Clear cache so cluster list and datasets endpoints reflect admin changes."""
-    cache.clear()
-
-
 @receiver(post_save, sender=Cluster)
 @receiver(post_delete, sender=Cluster)
 def invalidate_cluster_cache(sender, **kwargs):
-    _invalidate_cluster_cache(sender, **kwargs)
+    """Invalidate cached cluster and dataset list responses after admin changes."""
+    bump_namespace("clusters")
+
+
+# Tolerances, in degrees, of the simplified copies of region geometries, from the
+# most simplified (national zoom) to the least. Filled by simplify_regions.
+SIMPLIFICATION_TOLERANCES = {
+    "high": 0.01,
+    "medium": 0.001,
+    "low": 0.0001,
+}
+SIMPLIFIED_GEOMETRY_FIELDS = [
+    f"geometry_simplified_{i}" for i in SIMPLIFICATION_TOLERANCES
+]
+
+
+def related_region_geometries(*relations):
+    """
+    Lookups of every geometry column of the regions joined through ``relations``
+    (e.g. "province"), to defer() them when only the region names are needed.
+    """
+    return [
+        f"{relation}__{field}"
+        for relation in relations
+        for field in ["geometry", *SIMPLIFIED_GEOMETRY_FIELDS]
+    ]
 
 
-class Province(models.Model):
+class SimplifiedGeometryModel(models.Model):
+    geometry_simplified_high = models.GeometryField(
+        null=True, blank=True, editable=False
+    )
+    geometry_simplified_medium = models.GeometryField(
+        null=True, blank=True, editable=False
+    )
+    geometry_simplified_low = models.GeometryField(
+        null=True, blank=True, editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+
+class Province(SimplifiedGeometryModel):
     name = models.CharField(max_length=100, unique=True)
     geometry = models.GeometryField()
 
@@ -50,7 +88,7 @@ class Province(models.Model):
         ordering = ["name"]
 
 
-class AreaCouncil(models.Model):
+class AreaCouncil(SimplifiedGeometryModel):
     name = models.CharField(max_length=100, unique=True)
     province = models.ForeignKey(Province, null=False, on_delete=models.PROTECT)
     geometry = models.GeometryField()
@@ -159,6 +197,21 @@ class PMTilesDataset(models.Model):
     source = models.CharField(max_length=155, blank=True, null=True)
     url = models.CharField(max_length=1550)
     source_layer = models.CharField(max_length=155)
+    # Set on the archives built from a VectorDataset by tiles.build_vector_pmtiles
+    source_dataset = models.OneToOneField(
+        VectorDataset,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="pmtiles_dataset",
+        help_text="Vector dataset the archive is built from.",
+    )
+    file_name = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text="Storage name of the archive built from the source dataset.",
+    )
 
     def __str__(self):
         return f"{self.name} - {self.cluster} / {self.type}"
@@ -187,6 +240,10 @@ class VectorItem(models.Model):
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            # bbox queries are always scoped to one dataset (needs btree_gist)
+            GistIndex(fields=["dataset", "geometry"], name="datasets_vec_ds_geom_gist"),
+        ]
 
 
 class TabularDataset(models.Model):
@@ -218,6 +275,8 @@ class TabularItem(models.Model):
     province = models.ForeignKey(Province, null=True, on_delete=models.PROTECT)
     area_council = models.ForeignKey(AreaCouncil, null=True, on_delete=models.PROTECT)
     metadata = models.JSONField(default=dict)
+    # Hash of everything but the value, set by upsert imports
+    natural_key = models.CharField(max_length=32, null=True, editable=False)
 
     def __str__(self):
         return f"{self.id}"
@@ -227,3 +286,156 @@ class TabularItem(models.Model):
         indexes = [
             models.Index(fields=["dataset", "province", "area_council"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dataset", "natural_key"],
+                name="datasets_tabularitem_natural_key",
+            ),
+        ]
+
+
+class TabularAggregate(models.Model):
+    """
+    Summary of a TabularDataset's values per year, province, area council and
+    attribute, rebuilt by utils.refresh_tabular_aggregates after data changes.
+    """
+
+    dataset = models.ForeignKey(TabularDataset, on_delete=models.CASCADE)
+    year = models.PositiveIntegerField(null=True)
+    province = models.ForeignKey(Province, null=True, on_delete=models.CASCADE)
+    area_council = models.ForeignKey(AreaCouncil, null=True, on_delete=models.CASCADE)
+    attribute = models.CharField(max_length=155, blank=True, null=True)
+    value_sum = models.FloatField(default=0)
+    value_count = models.PositiveIntegerField(default=0)
+    value_min = models.FloatField(null=True)
+    value_max = models.FloatField(null=True)
+
+    def __str__(self):
+        return f"{self.dataset_id} / {self.year} / {self.attribute}"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["dataset", "year"], name="datasets_tab_agg_ds_year_idx"),
+        ]
+
+
+DATASET_CACHE_NAMESPACES = {
+    "rasterdataset": "raster",
+    "vectordataset": "vector",
+    "pmtilesdataset": "pmtiles",
+    "tabulardataset": "tabular",
+}
+
+
+@receiver(post_save, sender=RasterDataset)
+@receiver(post_delete, sender=RasterDataset)
+@receiver(post_save, sender=VectorDataset)
+@receiver(post_delete, sender=VectorDataset)
+@receiver(post_save, sender=PMTilesDataset)
+@receiver(post_delete, sender=PMTilesDataset)
+@receiver(post_save, sender=TabularDataset)
+@receiver(post_delete, sender=TabularDataset)
+def invalidate_dataset_cache(sender, instance, **kwargs):
+    """Invalidate cached list responses for the dataset's type, and its items."""
+    namespace = DATASET_CACHE_NAMESPACES[sender._meta.model_name]
+    bump_namespace(namespace, dataset_namespace(namespace, instance.pk))
+
+
+IMPORT_UPLOAD_TO = "staging/imports/" if settings.DEBUG else "production/imports/"
+
+
+def import_storage():
+    """The private storage of the uploaded import files."""
+    return storages["imports"]
+
+
+class ImportJob(models.Model):
+    """
+    An uploaded CSV/GeoJSON file waiting to be (or being) imported by the worker,
+    or a PMTiles archive of a VectorDataset to build (without a file).
+    """
+
+    KIND_CHOICES = {
+        "tabular": _("Tabular CSV"),
+        "vector": _("Vector GeoJSON"),
+        "pmtiles": _("Vector PMTiles build"),
+    }
+    FORMAT_CHOICES = {
+        "long": _("Long format"),
+        "wide": _("Wide format"),
+    }
+    STATUS_CHOICES = {
+        "pending": _("Pending"),
+        "running": _("Running"),
+        "done": _("Done"),
+        "failed": _("Failed"),
+    }
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Deleted once the job is done or failed
+    file = models.FileField(
+        upload_to=IMPORT_UPLOAD_TO, storage=import_storage, blank=True
+    )
+    original_name = models.CharField(max_length=255)
+    tabular_dataset = models.ForeignKey(
+        TabularDataset, null=True, blank=True, on_delete=models.CASCADE
+    )
+    vector_dataset = models.ForeignKey(
+        VectorDataset, null=True, blank=True, on_delete=models.CASCADE
+    )
+    format_style = models.CharField(
+        max_length=10, choices=FORMAT_CHOICES, default="long"
+    )
+    year = models.PositiveIntegerField(null=True, blank=True)
+    upsert = models.BooleanField(
+        default=False,
+        help_text=(
+            "Update the rows of the dataset matching the imported ones instead of "
+            "appending duplicates."
+        ),
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    duplicates_deleted = models.PositiveIntegerField(
+        default=0,
+        help_text="Older duplicates of existing rows deleted by an upsert import.",
+    )
+    first_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Number of times a worker started the job."
+    )
+    heartbeat = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last time the worker running the job reported it was alive.",
+    )
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+    @property
+    def dataset(self):
+        return self.tabular_dataset if self.kind == "tabular" else self.vector_dataset
+
+    class Meta:
+        ordering = ["id"]
+
+
+@receiver(pre_delete, sender=ImportJob)
+def delete_import_file(sender, instance, **kwargs):
+    """
+    Delete the uploaded file from storage when an ImportJob instance is deleted
+    """
+    if instance.file and instance.file.storage.exists(instance.file.name):
+        instance.file.storage.delete(instance.file.name)
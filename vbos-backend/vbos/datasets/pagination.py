@@ -1,4 +1,5 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -19,3 +20,51 @@ class DataResultsSetPagination(PageNumberPagination):
     page_size = 1000
     page_size_query_param = "page_size"
     max_page_size = 5000
+
+
+class DataCursorPagination(CursorPagination):
+    """
+    Keyset pagination on id for tabular/vector data endpoints. Skips the COUNT(*)
+    and OFFSET of page-number pagination, so deep pages cost the same as the first.
+    """
+    ordering = "id"
+    page_size = 1000
+    page_size_query_param = "page_size"
+    max_page_size = 5000
+
+
+class GeoJsonCursorPagination(DataCursorPagination):
+    """DataCursorPagination returning a GeoJSON FeatureCollection."""
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "type": "FeatureCollection",
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "features": data["features"],
+            }
+        )
+
+
+class CursorPaginationMixin:
+    """
+    Use `cursor_pagination_class` instead of `pagination_class` when the request
+    has `pagination=cursor`. Responses keep the same shape, without 'count'.
+    """
+    cursor_pagination_class = DataCursorPagination
+    cursor_pagination_query_param = "pagination"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            use_cursor = (
+                self.pagination_class is not None
+                and self.request.query_params.get(self.cursor_pagination_query_param)
+                == "cursor"
+            )
+            if use_cursor:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -1,7 +1,11 @@
+import json
+
 from rest_framework import serializers
+from rest_framework_gis.fields import GeometryField, GeoJsonDict
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
 from .models import (
+    SIMPLIFIED_GEOMETRY_FIELDS,
     AreaCouncil,
     Cluster,
     PMTilesDataset,
@@ -20,18 +24,51 @@ class ClusterSerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
-class ProvinceSerializer(GeoFeatureModelSerializer):
+class GeoJSONTextField(serializers.Field):
+    """Read-only geometry from GeoJSON text computed by the database (AsGeoJSON)."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return None if value is None else GeoJsonDict(json.loads(value))
+
+
+class GeometrySerializerMixin:
+    """
+    Serialise the geometry as the view asks in the context: from the
+    'geometry_geojson' annotation computed by PostGIS, or from the
+    'simplified_geometry' annotation, with 'geometry_precision' decimals.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get("geojson_geometry"):
+            self.fields["geometry"] = GeoJSONTextField(source="geometry_geojson")
+        elif self.context.get("simplified_geometry"):
+            self.fields["geometry"] = GeometryField(
+                source="simplified_geometry",
+                precision=self.context.get("geometry_precision"),
+            )
+        elif self.context.get("geometry_precision") is not None:
+            self.fields["geometry"] = GeometryField(
+                precision=self.context["geometry_precision"]
+            )
+
+
+class ProvinceSerializer(GeometrySerializerMixin, GeoFeatureModelSerializer):
     class Meta:
         model = Province
         geo_field = "geometry"
-        fields = "__all__"
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
-class AreaCouncilSerializer(GeoFeatureModelSerializer):
+class AreaCouncilSerializer(GeometrySerializerMixin, GeoFeatureModelSerializer):
     class Meta:
         model = AreaCouncil
         geo_field = "geometry"
-        fields = "__all__"
+        exclude = SIMPLIFIED_GEOMETRY_FIELDS
 
 
 class RasterDatasetSerializer(serializers.ModelSerializer):
@@ -89,7 +126,7 @@ class PMTilesDatasetSerializer(serializers.ModelSerializer):
         ]
 
 
-class VectorItemSerializer(GeoFeatureModelSerializer):
+class VectorItemSerializer(GeometrySerializerMixin, GeoFeatureModelSerializer):
     province = serializers.CharField(
         source="province.name", read_only=True, allow_null=True
     )
@@ -154,38 +191,14 @@ class TabularItemSerializer(serializers.ModelSerializer):
         return {**representation, **data_content}
 
 
-class TabularItemExcelSerializer(serializers.ModelSerializer):
-    province = serializers.ReadOnlyField(source="province.name")
-    area_council = serializers.ReadOnlyField(source="area_council.name")
-
-    # Dynamically add fields based on all possible keys in the data
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        # Get all possible keys from the queryset
-        if self.context.get("view"):
-            queryset = self.context["view"].get_queryset()
-            all_keys = set()
-            for item in queryset:
-                if item.metadata and isinstance(item.metadata, dict):
-                    all_keys.update(item.metadata.keys())
-
-            # Create a field for each key
-            for key in all_keys:
-                self.fields[key] = serializers.CharField(
-                    source=f"metadata.{key}",
-                    required=False,
-                    allow_blank=True,
-                    default="",
-                )
+class TabularAggregateSerializer(serializers.Serializer):
+    """One group of TabularDatasetAggregateView's response; grouping fields may be omitted."""
 
-    class Meta:
-        model = TabularItem
-        fields = [
-            "id",
-            "attribute",
-            "date",
-            "value",
-            "province",
-            "area_council",
-        ]
+    year = serializers.IntegerField(allow_null=True, required=False)
+    province = serializers.CharField(allow_null=True, required=False)
+    area_council = serializers.CharField(allow_null=True, required=False)
+    attribute = serializers.CharField(allow_null=True, required=False)
+    sum = serializers.FloatField()
+    count = serializers.IntegerField()
+    min = serializers.FloatField(allow_null=True)
+    max = serializers.FloatField(allow_null=True)
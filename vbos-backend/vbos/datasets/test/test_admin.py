@@ -1,12 +1,21 @@
 import io
+import tempfile
 from datetime import date
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from vbos.datasets.models import (
+    AreaCouncil,
     Cluster,
+    ImportJob,
+    PMTilesDataset,
+    Province,
     TabularDataset,
     TabularItem,
     VectorDataset,
@@ -32,6 +41,23 @@ class TabularItemAdminImportFileTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Import File")
 
+    def test_change_list_skips_region_geometries(self):
+        TabularItem.objects.create(
+            dataset=self.dataset,
+            attribute="a",
+            value=1,
+            province=Province.objects.get(name="TORBA"),
+            area_council=AreaCouncil.objects.get(name="East Gaua"),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("admin:datasets_tabularitem_changelist")
+            )
+        self.assertContains(response, "East Gaua")
+        for query in queries.captured_queries:
+            self.assertNotIn('"datasets_province"."geometry', query["sql"])
+            self.assertNotIn('"datasets_areacouncil"."geometry', query["sql"])
+
     def test_get_import_file_view(self):
         response = self.client.get(self.upload_url)
         self.assertEqual(response.status_code, 200)
@@ -45,20 +71,40 @@ class TabularItemAdminImportFileTests(TestCase):
         file_data.name = "test.txt"
         response = self.client.post(
             self.upload_url,
-            {"file": file_data, "dataset": self.dataset.id},
+            {"file_count": 1, "file_0": file_data, "dataset_0": self.dataset.id},
             follow=True,
         )
-        self.assertContains(response, "Please upload a CSV file")
+        self.assertContains(response, "is not a CSV file")
+        self.assertEqual(ImportJob.objects.count(), 0)
 
     def test_post_valid_csv_creates_items(self):
         csv_path = "./vbos/datasets/fixtures/test.csv"
         with open(csv_path, "rb") as file_data:
             response = self.client.post(
                 self.upload_url,
-                {"file": file_data, "dataset": self.dataset.id},
+                {"file_count": 1, "file_0": file_data, "dataset_0": self.dataset.id},
                 follow=True,
             )
-        self.assertContains(response, "Successfully created 3 new records")
+        self.assertContains(response, "Queued 1 file(s) for import.")
+        self.assertContains(response, "test.csv")
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.tabular_dataset, self.dataset)
+        self.assertTrue(job.file.storage.exists(job.file.name))
+        file_name = job.file.name
+        self.assertEqual(TabularItem.objects.count(), 0)
+
+        # In the test thread, so that the job sees the test transaction
+        call_command(
+            "process_import_jobs", "--once", "--workers", "1", stdout=io.StringIO()
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(job.error_count, 0)
+        # the uploaded file is deleted once imported
+        self.assertFalse(job.file)
+        self.assertFalse(job.file.storage.exists(file_name))
         self.assertEqual(TabularItem.objects.count(), 3)
         ti_1, ti_2, ti_3 = TabularItem.objects.all()
         self.assertEqual(ti_1.dataset.id, self.dataset.id)
@@ -127,7 +173,14 @@ class VectorItemAdminImportFileTests(TestCase):
                 {"file": file_data, "dataset": self.dataset.id},
                 follow=True,
             )
-        self.assertContains(response, "Successfully created 4 new records")
+        self.assertContains(response, "Queued test.geojson for import.")
+        # In the test thread, so that the job sees the test transaction
+        call_command(
+            "process_import_jobs", "--once", "--workers", "1", stdout=io.StringIO()
+        )
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.created_count, 4)
         self.assertEqual(VectorItem.objects.count(), 4)
         vi_1, vi_2, vi_3, vi_4 = VectorItem.objects.all()
         self.assertEqual(vi_1.dataset.id, self.dataset.id)
@@ -157,3 +210,102 @@ class VectorItemAdminImportFileTests(TestCase):
         self.assertEqual(vi_4.ref, "199163611")
         self.assertIsNone(vi_4.province)
         self.assertIsNone(vi_4.area_council)
+
+
+class VectorDatasetAdminBuildPMTilesTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            username="admin", password="password", email="admin@example.com"
+        )
+        self.client.login(username="admin", password="password")
+        self.dataset = VectorDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Education")
+        )
+        VectorItem.objects.create(
+            dataset=self.dataset, geometry=Point(168.3, -17.7), name="Port Vila"
+        )
+
+    def test_build_is_queued(self):
+        response = self.client.post(
+            reverse("admin:datasets_vectordataset_changelist"),
+            {"action": "build_pmtiles", "_selected_action": [self.dataset.id]},
+            follow=True,
+        )
+        self.assertContains(response, "Queued 1 PMTiles build(s).")
+        job = ImportJob.objects.get()
+        self.assertEqual((job.kind, job.status), ("pmtiles", "pending"))
+        self.assertFalse(PMTilesDataset.objects.exists())
+
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            call_command(
+                "process_import_jobs", "--once", "--workers", "1", stdout=io.StringIO()
+            )
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(PMTilesDataset.objects.get().name, "Schools")
+
+
+class ImportJobAdminTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            username="admin", password="password", email="admin@example.com"
+        )
+        self.client.login(username="admin", password="password")
+        self.dataset = TabularDataset.objects.create(
+            name="Test Dataset", cluster=Cluster.objects.create(name="Other")
+        )
+        self.job = ImportJob.objects.create(
+            kind="tabular",
+            file="staging/imports/test.csv",
+            original_name="test.csv",
+            tabular_dataset=self.dataset,
+            status="running",
+            rows_processed=120,
+            created_count=118,
+            error_count=2,
+            first_error="Cannot parse value: 'n/a'",
+        )
+
+    def test_progress_view(self):
+        url = reverse("admin:datasets_importjob_progress")
+        response = self.client.get(url, {"ids": str(self.job.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "test.csv")
+        self.assertContains(response, "Running")
+
+    def test_progress_status_view(self):
+        url = reverse("admin:datasets_importjob_progress_status")
+        response = self.client.get(url, {"ids": f"{self.job.id},x"})
+        self.assertEqual(response.status_code, 200)
+        job = response.json()["jobs"][0]
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["rows_processed"], 120)
+        self.assertEqual(job["error_count"], 2)
+        self.assertEqual(job["first_error"], "Cannot parse value: 'n/a'")
+
+    def test_progress_status_totals(self):
+        done = ImportJob.objects.create(
+            kind="tabular",
+            file="staging/imports/other.csv",
+            original_name="other.csv",
+            tabular_dataset=self.dataset,
+            status="done",
+            rows_processed=30,
+            created_count=30,
+        )
+        url = reverse("admin:datasets_importjob_progress_status")
+        response = self.client.get(url, {"ids": f"{self.job.id},{done.id}"})
+        self.assertEqual(
+            response.json()["totals"],
+            {
+                "finished": 1,
+                "count": 2,
+                "rows_processed": 150,
+                "created_count": 148,
+                "error_count": 2,
+            },
+        )
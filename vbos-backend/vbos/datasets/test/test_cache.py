@@ -0,0 +1,162 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ...users.test.factories import UserFactory
+from ..cache import bump_namespace, namespace_version, namespace_versions
+from ..checks import check_shared_cache
+from ..models import Cluster, TabularDataset, TabularItem, VectorDataset
+from ..utils import refresh_tabular_aggregates
+
+
+class TestNamespaceVersions(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_namespace(self):
+        tabular, vector = namespace_versions("tabular", "vector")
+        assert namespace_version("tabular") == tabular
+
+        bump_namespace("tabular")
+        assert namespace_version("tabular") != tabular
+        assert namespace_version("vector") == vector
+
+    def test_model_changes_bump_namespaces(self):
+        clusters, tabular, vector = namespace_versions("clusters", "tabular", "vector")
+        cluster = Cluster.objects.create(name="Health")
+        assert namespace_version("clusters") != clusters
+
+        dataset = TabularDataset.objects.create(name="Schools", cluster=cluster)
+        assert namespace_version("tabular") != tabular
+        assert namespace_version("vector") == vector
+
+        items = namespace_version(f"tabular:{dataset.pk}")
+        dataset.save()
+        assert namespace_version(f"tabular:{dataset.pk}") != items
+
+
+class TestSharedCacheCheck(TestCase):
+    def test_process_local_cache(self):
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": locmem}):
+            assert [i.id for i in check_shared_cache(None)] == ["datasets.E001"]
+
+        database = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "vbos_cache",
+        }
+        with override_settings(CACHES={"default": database}):
+            assert check_shared_cache(None) == []
+
+
+class TestCachedResponseMixin(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cluster = Cluster.objects.create(name="Health")
+        self.dataset = TabularDataset.objects.create(
+            name="Schools", cluster=self.cluster
+        )
+        self.url = reverse("datasets:tabular-list")
+        self.client.force_authenticate(user=UserFactory())
+
+    def test_invalidated_by_affected_namespace_only(self):
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_200_OK
+        assert req.data.get("count") == 1
+
+        # update() sends no signals, so the cached response is still served
+        TabularDataset.objects.filter(pk=self.dataset.pk).update(name="Clinics")
+        VectorDataset.objects.create(name="Roads", cluster=self.cluster)
+        req = self.client.get(self.url)
+        assert req.data.get("results")[0]["name"] == "Schools"
+
+        TabularDataset.objects.create(name="Teachers", cluster=self.cluster)
+        req = self.client.get(self.url)
+        assert req.data.get("count") == 2
+        assert req.data.get("results")[0]["name"] == "Clinics"
+
+    def test_permissions_checked_on_cached_responses(self):
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_200_OK
+
+        self.client.force_authenticate(user=None)
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_query_parameters_normalised(self):
+        req = self.client.get(self.url, {"cluster": "health", "page_size": 10})
+        assert req.data.get("count") == 1
+
+        TabularDataset.objects.filter(pk=self.dataset.pk).update(name="Clinics")
+        req = self.client.get(f"{self.url}?page_size=10&cluster=health")
+        assert req.data.get("results")[0]["name"] == "Schools"
+
+    def test_cluster_datasets(self):
+        url = reverse("datasets:cluster-datasets")
+        req = self.client.get(url, {"cluster": "health"})
+        assert req.status_code == status.HTTP_200_OK
+        etag = req.headers["ETag"]
+
+        TabularDataset.objects.filter(pk=self.dataset.pk).update(name="Clinics")
+        with self.assertNumQueries(0):
+            req = self.client.get(url, {"cluster": "health"})
+        assert req.data["tabular"][0]["name"] == "Schools"
+        assert req.headers["ETag"] == etag
+
+        req = self.client.get(url, {"cluster": "health"}, HTTP_IF_NONE_MATCH=etag)
+        assert req.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+class TestConditionalGetMixin(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.dataset = TabularDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Health")
+        )
+        TabularItem.objects.create(
+            dataset=self.dataset, date=date(2025, 1, 1), attribute="Schools", value=3
+        )
+        self.url = reverse("datasets:tabular-data", args=[self.dataset.id])
+        self.client.force_authenticate(user=UserFactory())
+
+    def test_not_modified(self):
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_200_OK
+        etag = req.headers["ETag"]
+        last_modified = req.headers["Last-Modified"]
+        assert last_modified
+        assert "no-cache" in req.headers["Cache-Control"]
+
+        req = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert req.status_code == status.HTTP_304_NOT_MODIFIED
+        assert req.headers["ETag"] == etag
+        assert req.headers["Last-Modified"] == last_modified
+
+        req = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert req.status_code == status.HTTP_304_NOT_MODIFIED
+        assert req.headers["ETag"] == etag
+
+        # other filters are another representation
+        req = self.client.get(
+            self.url, {"attribute": "schools"}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert req.status_code == status.HTTP_200_OK
+
+        TabularItem.objects.create(
+            dataset=self.dataset, date=date(2025, 1, 1), attribute="Schools", value=4
+        )
+        refresh_tabular_aggregates([self.dataset])
+        req = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["ETag"] != etag
+        assert req.data.get("count") == 2
+
+    def test_permissions_checked_first(self):
+        req = self.client.get(self.url)
+        self.client.force_authenticate(user=None)
+        req = self.client.get(self.url, HTTP_IF_NONE_MATCH=req.headers["ETag"])
+        assert req.status_code == status.HTTP_403_FORBIDDEN
@@ -1,9 +1,37 @@
+import gzip
+import tempfile
+import threading
+from datetime import timedelta
 from io import StringIO
+from os.path import exists, join
+from unittest.mock import patch
 
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from pmtiles.reader import MemorySource, Reader
+from rest_framework.test import APITestCase
 
-from ..models import TabularDataset, TabularItem
+from ...users.test.factories import UserFactory
+from ..jobs import (
+    claim_next_job,
+    job_dataset,
+    process_import_job,
+    requeue_stale_jobs,
+)
+from ..models import (
+    Cluster,
+    ImportJob,
+    PMTilesDataset,
+    TabularDataset,
+    TabularItem,
+    VectorDataset,
+    VectorItem,
+)
 
 
 class TestImportDatasets(TestCase):
@@ -55,6 +83,26 @@ class TestImportDatasets(TestCase):
             0,
         )
 
+        # Dry run only reports what would be removed
+        call_command("clean_tabular_data", "--dry-run", stdout=self.out)
+        self.assertEqual(TabularItem.objects.count(), 55)
+        self.assertIn(
+            "Would remove 21 redundant Number Schools tabular items.",
+            self.out.getvalue(),
+        )
+        self.assertIn(
+            "Would remove 4 redundant Health Facility tabular items.",
+            self.out.getvalue(),
+        )
+
+        # Clean redundant entries of a single dataset
+        schools = TabularDataset.objects.get(name="Number Schools")
+        call_command("clean_tabular_data", "--dataset", schools.id, stdout=self.out)
+        self.assertEqual(TabularItem.objects.count(), 34)
+        self.assertIn(
+            "Removed 21 redundant Number Schools tabular items.", self.out.getvalue()
+        )
+
         # Clean redundant entries
         call_command("clean_tabular_data", stdout=self.out)
         self.assertEqual(TabularItem.objects.count(), 30)
@@ -64,3 +112,229 @@ class TestImportDatasets(TestCase):
         self.assertEqual(
             TabularItem.objects.filter(dataset__name="Health Facility").count(), 20
         )
+
+
+class TestWarmCache(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cluster = Cluster.objects.create(name="Health & Education")
+        self.client.force_authenticate(user=UserFactory())
+
+    def test_warm_cache(self):
+        out = StringIO()
+        call_command("warm_cache", "--base-url", "http://testserver", stdout=out)
+        # clusters, provinces, 6 area council lists and the cluster's datasets
+        self.assertIn("Warmed 9 cached responses.", out.getvalue())
+
+        # update() sends no signals, so the warmed responses are served as is
+        Cluster.objects.filter(pk=self.cluster.pk).update(name="Other")
+        req = self.client.get("/api/v1/cluster/?page_size=100")
+        self.assertEqual(req.data["results"][0]["name"], "Health & Education")
+        req = self.client.get("/api/v1/datasets/?cluster=Health%20%26%20Education")
+        self.assertEqual(req.status_code, 200)
+        self.assertEqual(req.data["tabular"], [])
+
+    @override_settings(CACHE_WARM_URL=None)
+    def test_skipped_without_url(self):
+        out, err = StringIO(), StringIO()
+        call_command("warm_cache", stdout=out, stderr=err)
+        self.assertIn("Skipped", err.getvalue())
+        self.assertNotIn("Warmed", out.getvalue())
+
+
+class TestBuildPMTiles(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.dataset = VectorDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Education")
+        )
+        VectorItem.objects.create(
+            dataset=self.dataset, geometry=Point(168.3, -17.7), name="Port Vila"
+        )
+
+    def test_build_pmtiles(self):
+        out = StringIO()
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            call_command("build_pmtiles", self.dataset.id, "--max-zoom=4", stdout=out)
+            first_url = PMTilesDataset.objects.get().url
+            # Unchanged items give the same archive
+            call_command("build_pmtiles", self.dataset.id, "--max-zoom=4", stdout=out)
+            self.assertEqual(PMTilesDataset.objects.get().url, first_url)
+
+            VectorItem.objects.update(name="Luganville")
+            self.dataset.name = "Schools 2025"
+            self.dataset.save()
+            call_command("build_pmtiles", self.dataset.id, "--max-zoom=4", stdout=out)
+        self.assertIn("for Schools 2025.", out.getvalue())
+
+        # The renamed dataset's archive is rebuilt under a new name
+        pmtiles = PMTilesDataset.objects.get()
+        self.assertEqual(pmtiles.name, "Schools 2025")
+        self.assertEqual(pmtiles.source_dataset, self.dataset)
+        self.assertEqual(pmtiles.source_layer, "items")
+        self.assertRegex(
+            pmtiles.url,
+            rf"^/media/pmtiles/vector-{self.dataset.id}-[0-9a-f]{{16}}\.pmtiles$",
+        )
+        self.assertNotEqual(pmtiles.url, first_url)
+        self.assertFalse(
+            exists(join(self.media_root.name, first_url.removeprefix("/media/")))
+        )
+
+        path = join(self.media_root.name, pmtiles.url.removeprefix("/media/"))
+        with open(path, "rb") as f:
+            reader = Reader(MemorySource(f.read()))
+        self.assertEqual(reader.header()["max_zoom"], 4)
+        self.assertIn(b"Luganville", gzip.decompress(reader.get(0, 0, 0)))
+        self.assertIsNone(reader.get(1, 0, 0))
+
+
+class TestBenchmarkVectorBBox(TestCase):
+    def test_benchmark(self):
+        out = StringIO()
+        call_command(
+            "benchmark_vector_bbox", "--sizes", "100", "200", "--repeat=1", stdout=out
+        )
+        self.assertIn("100 features:", out.getvalue())
+        self.assertIn("200 features:", out.getvalue())
+        self.assertFalse(VectorItem.objects.exists())
+        self.assertFalse(VectorDataset.objects.exists())
+
+
+class TestProcessImportJobs(TestCase):
+    def setUp(self):
+        cluster = Cluster.objects.create(name="Other")
+        self.datasets = [
+            TabularDataset.objects.create(name=f"Dataset {i}", cluster=cluster)
+            for i in range(2)
+        ]
+        self.jobs = [
+            ImportJob.objects.create(
+                kind="tabular",
+                file="staging/imports/missing.csv",
+                original_name=f"{i}.csv",
+                tabular_dataset=dataset,
+            )
+            for i, dataset in enumerate([self.datasets[0], *self.datasets])
+        ]
+
+    def test_claim_skips_busy_datasets(self):
+        first = claim_next_job()
+        self.assertEqual(first, self.jobs[0])
+        # The second job imports into the same dataset as the running one
+        second = claim_next_job(busy_datasets={job_dataset(first)})
+        self.assertEqual(second, self.jobs[2])
+        self.assertIsNone(
+            claim_next_job(busy_datasets={job_dataset(first), job_dataset(second)})
+        )
+        self.assertEqual(claim_next_job(), self.jobs[1])
+
+    def test_claim_skips_busy_vector_datasets(self):
+        ImportJob.objects.all().delete()
+        dataset = VectorDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Education")
+        )
+        import_job = ImportJob.objects.create(
+            kind="vector", original_name="schools.geojson", vector_dataset=dataset
+        )
+        build_job = ImportJob.objects.create(
+            kind="pmtiles", original_name="PMTiles of Schools", vector_dataset=dataset
+        )
+        # The PMTiles build waits for the import into its dataset, and vice versa
+        self.assertEqual(claim_next_job(), import_job)
+        self.assertIsNone(claim_next_job(busy_datasets={job_dataset(import_job)}))
+        self.assertEqual(claim_next_job(), build_job)
+        import_job.status = "pending"
+        import_job.save()
+        self.assertIsNone(claim_next_job(busy_datasets={job_dataset(build_job)}))
+
+    def test_requeue_stale_jobs(self):
+        interrupted, crashing, alive = self.jobs
+        long_ago = timezone.now() - timedelta(hours=1)
+        for job, attempts, heartbeat in [
+            (interrupted, 1, long_ago),
+            (crashing, 2, long_ago),
+            (alive, 1, timezone.now()),
+        ]:
+            ImportJob.objects.filter(pk=job.pk).update(
+                status="running",
+                started=long_ago,
+                heartbeat=heartbeat,
+                attempts=attempts,
+                rows_processed=10,
+            )
+
+        self.assertEqual(requeue_stale_jobs(), (1, 1))
+        interrupted.refresh_from_db()
+        self.assertEqual(
+            (interrupted.status, interrupted.started, interrupted.rows_processed),
+            ("pending", None, 0),
+        )
+        crashing.refresh_from_db()
+        self.assertEqual(crashing.status, "failed")
+        self.assertIn("stopped while running this job 2 times", crashing.first_error)
+        alive.refresh_from_db()
+        self.assertEqual(alive.status, "running")
+
+        # The requeued job is claimed again by the next worker
+        job = claim_next_job()
+        self.assertEqual((job, job.attempts), (interrupted, 2))
+
+    def test_batch_report(self):
+        out = StringIO()
+        call_command("process_import_jobs", "--once", "--workers", "1", stdout=out)
+        self.assertEqual(
+            set(ImportJob.objects.values_list("status", flat=True)), {"failed"}
+        )
+        self.assertIn("Processed 3 job(s) in", out.getvalue())
+        self.assertIn(
+            "3 job(s) failed, 0 rows created, 0 rows failed.", out.getvalue()
+        )
+
+
+class TestProcessImportJobsConcurrently(TransactionTestCase):
+    # Keep the provinces and area councils created by the migrations
+    serialized_rollback = True
+
+    def setUp(self):
+        cluster = Cluster.objects.create(name="Other")
+        for i in range(2):
+            ImportJob.objects.create(
+                kind="tabular",
+                file=ContentFile(
+                    b"Year,Attribute,Province,Value\n"
+                    b"2024,a,Torba,10\n"
+                    b"2024,b,Torba,20\n",
+                    name=f"{i}.csv",
+                ),
+                original_name=f"{i}.csv",
+                tabular_dataset=TabularDataset.objects.create(
+                    name=f"Dataset {i}", cluster=cluster
+                ),
+            )
+
+    def test_workers(self):
+        threads = {}
+
+        def process(job):
+            threads[job.pk] = (threading.get_ident(), connections["default"])
+            return process_import_job(job)
+
+        with patch("vbos.datasets.jobs.process_import_job", side_effect=process):
+            call_command(
+                "process_import_jobs", "--once", "--workers", "2", stdout=StringIO()
+            )
+
+        self.assertEqual(
+            list(
+                ImportJob.objects.order_by("id").values_list("status", "created_count")
+            ),
+            [("done", 2), ("done", 2)],
+        )
+        self.assertEqual(TabularItem.objects.count(), 4)
+        # Each job ran in a pool thread, which closed its connection
+        self.assertEqual(len(threads), 2)
+        for ident, wrapper in threads.values():
+            self.assertNotEqual(ident, threading.get_ident())
+            self.assertIsNone(wrapper.connection)
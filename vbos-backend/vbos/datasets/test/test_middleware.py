@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import brotli
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ...users.test.factories import UserFactory
+from ..middleware import accepted_encoding, compressed_cache_key
+from ..models import Cluster, TabularDataset, TabularItem
+
+
+class TestAcceptedEncoding(TestCase):
+    def encoding(self, header):
+        return accepted_encoding(RequestFactory().get("/", HTTP_ACCEPT_ENCODING=header))
+
+    def test_accepted_encoding(self):
+        self.assertEqual(self.encoding("gzip, deflate, br"), "br")
+        self.assertEqual(self.encoding("gzip, br;q=0.5"), "gzip")
+        self.assertEqual(self.encoding("gzip;q=0, *"), "br")
+        self.assertEqual(self.encoding("deflate"), None)
+        self.assertEqual(self.encoding(""), None)
+
+
+class TestCompressionMiddleware(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=UserFactory())
+        self.url = reverse("datasets:province-list")
+
+    def test_gzip(self):
+        req = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in req.headers["Vary"]
+        assert req.headers["ETag"].startswith('W/"')
+        data = json.loads(gzip.decompress(req.content))
+        assert len(data["features"]) == 6
+
+        # weak ETags still validate
+        req = self.client.get(
+            self.url,
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=req.headers["ETag"],
+        )
+        assert req.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_brotli_cached(self):
+        req = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        assert req.headers["Content-Encoding"] == "br"
+        content = brotli.decompress(req.content)
+        assert len(json.loads(content)["features"]) == 6
+
+        etag = req.headers["ETag"].removeprefix("W/")
+        key = compressed_cache_key(etag, "application/json", "br")
+        assert cache.get(key) == req.content
+        req = self.client.get(self.url, HTTP_ACCEPT_ENCODING="br")
+        assert brotli.decompress(req.content) == content
+
+    def test_not_compressed(self):
+        req = self.client.get(self.url)
+        assert "Content-Encoding" not in req.headers
+
+        # below COMPRESSION_MIN_SIZE
+        Cluster.objects.create(name="Health")
+        req = self.client.get(
+            reverse("datasets:cluster-list"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        assert req.status_code == status.HTTP_200_OK
+        assert "Content-Encoding" not in req.headers
+
+    def test_streaming(self):
+        dataset = TabularDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Education")
+        )
+        TabularItem.objects.bulk_create(
+            TabularItem(dataset=dataset, attribute="Schools", value=i, date="2025-01-01")
+            for i in range(100)
+        )
+        url = reverse("datasets:tabular-export", args=[dataset.id])
+        req = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        assert req.headers["Content-Encoding"] == "gzip"
+        data = json.loads(gzip.decompress(b"".join(req.streaming_content)))
+        assert len(data) == 100
@@ -1,8 +1,11 @@
+import json
+
 from django.urls.base import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from vbos.datasets.models import Cluster
+from vbos.users.test.factories import UserFactory
 
 
 class TestProvinceListView(APITestCase):
@@ -13,3 +16,27 @@ class TestProvinceListView(APITestCase):
         assert req.data.get("count") == 6
         assert req.data.get("features")[0]["properties"]["name"] == "MALAMPA"
         assert req.data.get("features")[0]["geometry"]["type"] == "MultiPolygon"
+
+    def test_simplified_geometries(self):
+        self.client.force_authenticate(user=UserFactory())
+        url = reverse("datasets:province-list")
+        full = self.client.get(url).data.get("features")[0]["geometry"]
+
+        req = self.client.get(url, {"simplify": "high"})
+        assert req.status_code == status.HTTP_200_OK
+        assert req.data.get("count") == 6
+        assert req.data.get("features")[0]["properties"]["name"] == "MALAMPA"
+        simplified = req.data.get("features")[0]["geometry"]
+        assert simplified["type"] == "MultiPolygon"
+        assert len(json.dumps(simplified)) < len(json.dumps(full))
+        assert "geometry_simplified_high" not in req.data["features"][0]["properties"]
+
+        # zoom 6 uses the same level
+        req = self.client.get(url, {"zoom": 6})
+        assert req.data.get("features")[0]["geometry"] == simplified
+
+        req = self.client.get(url, {"zoom": 16})
+        assert req.data.get("features")[0]["geometry"] == full
+
+        req = self.client.get(url, {"simplify": "extreme"})
+        assert req.status_code == status.HTTP_400_BAD_REQUEST
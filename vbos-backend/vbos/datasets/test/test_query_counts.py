@@ -0,0 +1,118 @@
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ...users.test.factories import UserFactory
+from ..models import (
+    AreaCouncil,
+    Cluster,
+    PMTilesDataset,
+    Province,
+    RasterDataset,
+    TabularDataset,
+    TabularItem,
+    VectorDataset,
+    VectorItem,
+)
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestQueryCounts(APITestCase):
+    """The number of queries of each endpoint doesn't grow with the results."""
+
+    def setUp(self):
+        self.clusters = [
+            Cluster.objects.create(name=name) for name in ["Health", "Education"]
+        ]
+        self.vector = self.create_datasets(0)
+        self.client.force_authenticate(user=UserFactory())
+
+    def create_datasets(self, index):
+        vector = None
+        for cluster in self.clusters:
+            name = f"Dataset {index}"
+            TabularDataset.objects.create(name=name, cluster=cluster)
+            RasterDataset.objects.create(name=name, cluster=cluster)
+            PMTilesDataset.objects.create(
+                name=name, cluster=cluster, url="https://example.com", source_layer="a"
+            )
+            vector = VectorDataset.objects.create(name=name, cluster=cluster)
+        return vector
+
+    def create_vector_items(self, index):
+        for i in range(3):
+            VectorItem.objects.create(
+                dataset=self.vector,
+                geometry=Point(168.3, -17.7),
+                name=f"Item {index}.{i}",
+                province=Province.objects.get(name="TORBA"),
+                area_council=AreaCouncil.objects.get(name="East Gaua"),
+            )
+
+    def create_tabular_items(self, index):
+        dataset = TabularDataset.objects.first()
+        for i in range(3):
+            TabularItem.objects.create(
+                dataset=dataset,
+                attribute=f"Item {index}.{i}",
+                value=i,
+                province=Province.objects.get(name="TORBA"),
+                area_council=AreaCouncil.objects.get(name="East Gaua"),
+            )
+
+    def assert_queries(self, url, params, count, add_results=None):
+        add_results = add_results or self.create_datasets
+        for index in range(1, 3):
+            add_results(index)
+            cache.clear()
+            with self.assertNumQueries(count) as queries:
+                req = self.client.get(url, params)
+            assert req.status_code == status.HTTP_200_OK
+        return [query["sql"] for query in queries.captured_queries]
+
+    def assert_no_region_geometries(self, queries):
+        # Only the names of the joined regions are serialized
+        for sql in queries:
+            assert '"datasets_province"."geometry' not in sql
+            assert '"datasets_areacouncil"."geometry' not in sql
+            assert '"datasets_province"."name"' in sql
+
+    def test_dataset_lists(self):
+        for kind in ["raster", "pmtiles", "vector", "tabular"]:
+            # count and page
+            self.assert_queries(reverse(f"datasets:{kind}-list"), {}, 2)
+
+    def test_dataset_details(self):
+        for kind, model in [
+            ("raster", RasterDataset),
+            ("pmtiles", PMTilesDataset),
+            ("vector", VectorDataset),
+            ("tabular", TabularDataset),
+        ]:
+            url = reverse(f"datasets:{kind}-detail", args=[model.objects.first().id])
+            self.assert_queries(url, {}, 1)
+
+    def test_cluster_datasets(self):
+        # one query per dataset type
+        url = reverse("datasets:cluster-datasets")
+        self.assert_queries(url, {"cluster": "health"}, 4)
+
+    def test_vector_data(self):
+        # count and page
+        url = reverse("datasets:vector-data", args=[self.vector.id])
+        queries = self.assert_queries(url, {}, 2, self.create_vector_items)
+        self.assert_no_region_geometries(queries[1:])
+
+    def test_tabular_data(self):
+        # count and page
+        dataset = TabularDataset.objects.first()
+        url = reverse("datasets:tabular-data", args=[dataset.id])
+        queries = self.assert_queries(url, {}, 2, self.create_tabular_items)
+        self.assert_no_region_geometries(queries[1:])
@@ -1,11 +1,22 @@
-from datetime import date
+import json
+from datetime import date, datetime
+from io import BytesIO
 
 from django.urls import reverse
+from openpyxl import load_workbook
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from ...users.test.factories import UserFactory
-from ..models import AreaCouncil, Cluster, Province, TabularDataset, TabularItem
+from ..models import (
+    AreaCouncil,
+    Cluster,
+    Province,
+    TabularAggregate,
+    TabularDataset,
+    TabularItem,
+)
+from ..utils import refresh_tabular_aggregates, tabular_aggregate_group
 
 
 class TestTabularDatasetListDetailViews(APITestCase):
@@ -197,6 +208,47 @@ class TestTabularDatasetDataView(APITestCase):
         assert req.status_code == status.HTTP_200_OK
         assert req.data.get("count") == 4
 
+    def test_cursor_pagination(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("datasets:tabular-data", args=[self.dataset_2.id])
+        req = self.client.get(url, {"pagination": "cursor", "page_size": 2})
+        assert req.status_code == status.HTTP_200_OK
+        assert "count" not in req.data
+        assert req.data.get("previous") is None
+        values = [i["value"] for i in req.data.get("results")]
+
+        next_url = req.data.get("next")
+        while next_url:
+            req = self.client.get(next_url)
+            assert req.status_code == status.HTTP_200_OK
+            values += [i["value"] for i in req.data.get("results")]
+            next_url = req.data.get("next")
+        assert values == [0.93, 0.9, 0.91, 0.95, 0.87]
+
+    def test_export(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("datasets:tabular-export", args=[self.dataset_2.id])
+        req = self.client.get(url, {"province": "torba"})
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["Content-Type"] == "application/json"
+        assert req.headers[
+            "content-disposition"
+        ] == "attachment; filename=vbos-mis-tabular-{}.json".format(self.dataset_2.id)
+        data = json.loads(b"".join(req.streaming_content))
+        assert [i["value"] for i in data] == [0.93, 0.9, 0.91, 0.95]
+        assert data[0]["area_council"] == "East Gaua"
+        assert data[0]["additional_value"] == "test"
+
+        req = self.client.get(url, {"output": "ndjson"})
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(req.streaming_content).decode().splitlines()
+        assert len(lines) == 5
+        assert json.loads(lines[4])["value"] == 0.87
+
+        req = self.client.get(url, {"output": "csv"})
+        assert req.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_xlsx_format(self):
         url = reverse("datasets:tabular-data-xlsx", args=[self.dataset_1.id])
         req = self.client.get(url)
@@ -208,3 +260,127 @@ class TestTabularDatasetDataView(APITestCase):
         assert req.headers[
             "content-disposition"
         ] == "attachment; filename=vbos-mis-tabular-{}.xlsx".format(self.dataset_1.id)
+
+    def test_xlsx_content(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("datasets:tabular-data-xlsx", args=[self.dataset_2.id])
+        req = self.client.get(url, {"province": "torba"})
+        assert req.status_code == status.HTTP_200_OK
+        workbook = load_workbook(BytesIO(b"".join(req.streaming_content)))
+        rows = list(workbook.active.values)
+        assert rows[0] == (
+            "id",
+            "attribute",
+            "date",
+            "value",
+            "province",
+            "area_council",
+            "additional_value",
+        )
+        assert len(rows) == 5
+        assert rows[1][1:] == (
+            "Employed Population",
+            datetime(2025, 1, 1),
+            0.93,
+            "TORBA",
+            "East Gaua",
+            "test",
+        )
+        assert rows[2][6] in ("", None)
+
+
+class TestTabularDatasetAggregateView(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.dataset = TabularDataset.objects.create(
+            name="Employment", cluster=Cluster.objects.create(name="Other")
+        )
+        torba = Province.objects.get(name="TORBA")
+        tafea = Province.objects.get(name="TAFEA")
+        for day, province, value in [
+            (date(2024, 6, 1), torba, 10),
+            (date(2025, 1, 1), torba, 20),
+            (date(2025, 2, 1), torba, 40),
+            (date(2025, 1, 1), tafea, 5),
+        ]:
+            TabularItem.objects.create(
+                dataset=self.dataset,
+                date=day,
+                province=province,
+                attribute="Employed Population",
+                value=value,
+            )
+        refresh_tabular_aggregates([self.dataset])
+        self.url = reverse("datasets:tabular-aggregates", args=[self.dataset.id])
+
+    def test_authentication_required(self):
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_aggregates(self):
+        self.client.force_authenticate(user=self.user)
+        req = self.client.get(self.url)
+        assert req.status_code == status.HTTP_200_OK
+        assert len(req.data) == 3
+
+        req = self.client.get(self.url, {"group_by": "province", "year": 2025})
+        assert req.status_code == status.HTTP_200_OK
+        assert len(req.data) == 2
+        assert req.data[0] == {
+            "province": "TAFEA",
+            "sum": 5,
+            "count": 1,
+            "min": 5,
+            "max": 5,
+        }
+        assert req.data[1] == {
+            "province": "TORBA",
+            "sum": 60,
+            "count": 2,
+            "min": 20,
+            "max": 40,
+        }
+
+        req = self.client.get(self.url, {"group_by": "year", "province": "torba"})
+        assert req.status_code == status.HTTP_200_OK
+        assert [(i["year"], i["sum"]) for i in req.data] == [(2024, 10), (2025, 60)]
+
+        req = self.client.get(self.url, {"group_by": "island"})
+        assert req.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_refresh_groups(self):
+        untouched = TabularAggregate.objects.get(year=2024)
+        tafea = Province.objects.get(name="TAFEA")
+        # update() and delete() on querysets leave the aggregates as they were
+        changed = TabularItem.objects.filter(date=date(2025, 2, 1))
+        changed.update(value=60)
+        removed = TabularItem.objects.filter(province=tafea)
+        removed_group = tabular_aggregate_group(removed.get())
+        removed.delete()
+        added = TabularItem.objects.create(
+            dataset=self.dataset,
+            date=date(2026, 1, 1),
+            province=tafea,
+            attribute="Employed Population",
+            value=7,
+        )
+        refresh_tabular_aggregates(
+            [self.dataset],
+            [
+                tabular_aggregate_group(changed.get()),
+                removed_group,
+                tabular_aggregate_group(added),
+            ],
+        )
+
+        assert sorted(
+            TabularAggregate.objects.values_list(
+                "year", "province__name", "value_sum", "value_count", "value_max"
+            )
+        ) == [
+            (2024, "TORBA", 10, 1, 10),
+            (2025, "TORBA", 80, 2, 60),
+            (2026, "TAFEA", 7, 1, 7),
+        ]
+        # Other groups are left in place
+        assert TabularAggregate.objects.filter(pk=untouched.pk).exists()
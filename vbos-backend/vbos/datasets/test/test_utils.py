@@ -1,8 +1,33 @@
+import csv
+import json
 from datetime import date
+from io import BytesIO, StringIO
 
+from django.contrib.gis.geos import Point
 from django.test import TestCase
 
-from vbos.datasets.utils import CSVRow, GeoJSONProperties, group_by_dataset
+from vbos.datasets.models import (
+    AreaCouncil,
+    Cluster,
+    Province,
+    TabularDataset,
+    TabularItem,
+    VectorDataset,
+    VectorItem,
+)
+from vbos.datasets.utils import (
+    CSVRow,
+    assign_vector_item_regions,
+    GeoJSONFeatureReader,
+    GeoJSONProperties,
+    geometry_from_geojson,
+    get_region_index,
+    group_by_dataset,
+    import_geojson,
+    import_long_format_csv,
+    import_wide_format_csv,
+    iter_geojson_features,
+)
 
 
 class TestGeoJSONProperties(TestCase):
@@ -124,3 +149,301 @@ class TestGroupByDataset(TestCase):
         self.assertEqual(len(result[1]["items"]), 2)
         self.assertEqual(result[0]["items"][0]["Attribute"], "ecce")
         self.assertEqual(result[0]["items"][1]["Attribute"], "tertiary")
+
+
+class TestImportLongFormatCsv(TestCase):
+    def setUp(self):
+        self.dataset = TabularDataset.objects.create(
+            name="Test Dataset", cluster=Cluster.objects.create(name="Other")
+        )
+
+    def test_bulk_import(self):
+        with open("./vbos/datasets/fixtures/test.csv") as file:
+            created, errors, first_error = import_long_format_csv(
+                csv.DictReader(file), self.dataset, chunk_size=2
+            )
+        self.assertEqual((created, errors, first_error), (3, 0, None))
+        ti_1, ti_2, ti_3 = TabularItem.objects.all()
+        self.assertEqual(ti_1.province.name, "TAFEA")
+        self.assertEqual(ti_1.area_council.name, "Futuna")
+        self.assertEqual(ti_1.attribute, "ecce")
+        self.assertEqual(ti_2.date, date(2022, 5, 1))
+        self.assertIsNone(ti_3.province)
+        self.assertIsNone(ti_3.area_council)
+
+    def test_invalid_rows_are_counted(self):
+        data = StringIO(
+            "Year,Attribute,Province,Value\n"
+            "2024,a,Torba,10\n"
+            "2024,b,Torba,n/a\n"
+            "2024,c,Torba,\n"
+        )
+        created, errors, first_error = import_long_format_csv(
+            csv.DictReader(data), self.dataset
+        )
+        self.assertEqual(created, 1)
+        self.assertEqual(errors, 2)
+        self.assertEqual(first_error, "Cannot parse value: 'n/a'")
+        self.assertEqual(TabularItem.objects.get().province.name, "TORBA")
+
+    def test_upsert(self):
+        content = (
+            "Year,Attribute,Province,Value,Sector\n"
+            "2024,a,Torba,10,census\n"
+            "2024,b,Torba,20,census\n"
+            "2024,b,Torba,30,survey\n"
+        )
+        # imported twice without upsert, as before
+        for _ in range(2):
+            import_long_format_csv(csv.DictReader(StringIO(content)), self.dataset)
+        self.assertEqual(TabularItem.objects.count(), 6)
+
+        corrected = content.replace("2024,b,Torba,20", "2024,b,Torba,25")
+        stats = {}
+        created, errors, _ = import_long_format_csv(
+            csv.DictReader(StringIO(corrected)), self.dataset, upsert=True, stats=stats
+        )
+        self.assertEqual((created, errors), (1, 0))
+        # unchanged rows are processed too, and the second import was deleted
+        torba = Province.objects.get(name="TORBA").pk
+        self.assertEqual(
+            stats,
+            {
+                "rows_processed": 3,
+                "duplicates_deleted": 3,
+                "groups": {
+                    (self.dataset.pk, 2024, torba, None, "a"),
+                    (self.dataset.pk, 2024, torba, None, "b"),
+                },
+            },
+        )
+        self.assertEqual(
+            sorted(TabularItem.objects.values_list("attribute", "value")),
+            [("a", 10), ("b", 25), ("b", 30)],
+        )
+
+        corrected += "2025,a,Torba,12,census\n"
+        created, _, _ = import_long_format_csv(
+            csv.DictReader(StringIO(corrected)), self.dataset, upsert=True
+        )
+        self.assertEqual(created, 1)
+        self.assertEqual(TabularItem.objects.count(), 4)
+        self.assertFalse(TabularItem.objects.filter(natural_key__isnull=True).exists())
+
+
+class TestImportWideFormatCsv(TestCase):
+    def setUp(self):
+        self.dataset = TabularDataset.objects.create(
+            name="Test Dataset", cluster=Cluster.objects.create(name="Other")
+        )
+        # The row after the header is not imported
+        self.content = (
+            "Region,Households,Population\n"
+            "Units,count,people\n"
+            "Torba,1 200,\"5,300\"\n"
+            "East Gaua,150,n/a\n"
+            "National,,20000\n"
+        )
+
+    def test_melt(self):
+        created, errors, first_error = import_wide_format_csv(
+            csv.DictReader(StringIO(self.content)), self.dataset, 2023, chunk_size=2
+        )
+        self.assertEqual((created, errors), (4, 1))
+        self.assertEqual(first_error, "Cannot parse value: 'n/a'")
+        self.assertEqual(
+            list(
+                TabularItem.objects.order_by("id").values_list(
+                    "metadata__region",
+                    "attribute",
+                    "value",
+                    "province__name",
+                    "area_council__name",
+                )
+            ),
+            [
+                ("Torba", "Households", 1200, "TORBA", None),
+                ("Torba", "Population", 5300, "TORBA", None),
+                ("East Gaua", "Households", 150, "TORBA", "East Gaua"),
+                ("National", "Population", 20000, None, None),
+            ],
+        )
+        dates = set(TabularItem.objects.values_list("date", flat=True))
+        self.assertEqual(dates, {date(2023, 1, 1)})
+
+    def test_upsert(self):
+        import_wide_format_csv(
+            csv.DictReader(StringIO(self.content)), self.dataset, 2023
+        )
+        corrected = self.content.replace("East Gaua,150", "East Gaua,160")
+        created, errors, _ = import_wide_format_csv(
+            csv.DictReader(StringIO(corrected)), self.dataset, 2023, upsert=True
+        )
+        self.assertEqual((created, errors), (1, 1))
+        self.assertEqual(TabularItem.objects.count(), 4)
+        self.assertEqual(
+            TabularItem.objects.get(metadata__region="East Gaua").value, 160
+        )
+
+
+class TestRegionIndex(TestCase):
+    def test_lookups_are_normalised(self):
+        regions = get_region_index()
+        self.assertEqual(regions.province(" torba ").name, "TORBA")
+        self.assertEqual(regions.area_council("east  GAUA").name, "East Gaua")
+        self.assertIsNone(regions.province(""))
+        self.assertIsNone(regions.area_council(None))
+
+    def test_resolve(self):
+        regions = get_region_index()
+        province, area_council = regions.resolve("Futuna")
+        self.assertEqual(province.name, "TAFEA")
+        self.assertEqual(area_council.name, "Futuna")
+        self.assertEqual(regions.resolve("Tafea")[0].name, "TAFEA")
+        self.assertEqual(regions.resolve("National"), (None, None))
+        self.assertEqual(regions.resolve("Nowhere"), (None, None))
+
+    def test_lookups_do_not_query_the_database(self):
+        regions = get_region_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(regions.resolve("Futuna")[0].name, "TAFEA")
+            get_region_index().province("Torba")
+
+    def test_invalidated_on_save(self):
+        regions = get_region_index()
+        province = Province.objects.get(name="TORBA")
+        AreaCouncil.objects.create(
+            name="New Council", province=province, geometry=province.geometry
+        )
+        self.assertIsNot(get_region_index(), regions)
+        self.assertEqual(
+            get_region_index().area_council("new council").province, province
+        )
+
+
+class TestGeoJSONStreaming(TestCase):
+    def setUp(self):
+        with open("./vbos/datasets/fixtures/test.geojson") as file:
+            self.content = file.read()
+        self.features = json.loads(self.content)["features"]
+
+    def test_feature_reader_with_small_reads(self):
+        for read_size in [1, 7, 100, 64 * 1024]:
+            reader = GeoJSONFeatureReader(StringIO(self.content), read_size=read_size)
+            self.assertEqual(list(reader), self.features)
+
+    def test_feature_reader_skips_other_members(self):
+        content = '{"features": [{"a": 1}], "bbox": [1, 2, 3.5, 4]}'
+        self.assertEqual(list(GeoJSONFeatureReader(StringIO(content), 3)), [{"a": 1}])
+        self.assertEqual(list(GeoJSONFeatureReader(StringIO('{"features": []}'))), [])
+
+    def test_feature_reader_truncated_file(self):
+        with self.assertRaises(ValueError):
+            list(GeoJSONFeatureReader(StringIO('{"features": [{"a": 1}')))
+
+    def test_feature_reader_stops_at_malformed_feature(self):
+        content = (
+            '{"features": [{"a": 1 "b": 2}, '
+            + ", ".join(['{"c": 3}'] * 10000)
+            + "]}"
+        )
+        stream = StringIO(content)
+        with self.assertRaises(ValueError):
+            list(GeoJSONFeatureReader(stream, read_size=100))
+        # The rest of the file isn't read into memory to look for the end
+        self.assertEqual(stream.tell(), 100)
+
+    def test_newline_delimited(self):
+        content = "\n".join(json.dumps(f) for f in self.features) + "\n\n"
+        features = list(iter_geojson_features(StringIO(content), newline_delimited=True))
+        self.assertEqual(features, self.features)
+
+    def test_geometry_from_geojson(self):
+        for geometry in [
+            {"type": "Point", "coordinates": [167.5, -16.2]},
+            {"type": "LineString", "coordinates": [[0, 0], [1, 1.5]]},
+            {"type": "Polygon", "coordinates": [[[0, 0], [0, 3], [3, 3], [0, 0]]]},
+            {"type": "MultiPoint", "coordinates": [[0, 0], [1, 1]]},
+            {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[0, 0], [0, 1], [1, 1], [0, 0]]],
+                    [[[5, 5], [5, 6], [6, 6], [5, 5]]],
+                ],
+            },
+            {
+                "type": "GeometryCollection",
+                "geometries": [{"type": "Point", "coordinates": [1, 2]}],
+            },
+        ]:
+            geom = geometry_from_geojson(geometry)
+            self.assertEqual(geom.srid, 4326)
+            self.assertEqual(json.loads(geom.geojson), geometry)
+
+    def test_geometry_from_geojson_drops_z(self):
+        geom = geometry_from_geojson({"type": "Point", "coordinates": [1, 2, 3]})
+        self.assertEqual(geom.coords, (1.0, 2.0))
+
+    def test_import_geojson(self):
+        dataset = VectorDataset.objects.create(
+            name="Test Dataset", cluster=Cluster.objects.create(name="Other")
+        )
+        features = self.features + [{"type": "Feature", "properties": {}}]
+        content = json.dumps({"type": "FeatureCollection", "features": features})
+        created, errors, first_error = import_geojson(
+            BytesIO(content.encode()), dataset, chunk_size=2
+        )
+        self.assertEqual((created, errors), (4, 1))
+        self.assertIsNotNone(first_error)
+        item = VectorItem.objects.get(ref="13NC")
+        self.assertEqual(item.province.name, "TAFEA")
+        self.assertEqual(item.area_council.name, "Futuna")
+        self.assertEqual(item.geometry.geom_type, "LineString")
+
+    def test_import_geojson_with_byte_order_mark(self):
+        dataset = VectorDataset.objects.create(
+            name="Test Dataset", cluster=Cluster.objects.create(name="Other")
+        )
+        created, errors, _ = import_geojson(
+            BytesIO(self.content.encode("utf-8-sig")), dataset
+        )
+        self.assertEqual((created, errors), (len(self.features), 0))
+
+
+class TestAssignVectorItemRegions(TestCase):
+    def setUp(self):
+        self.dataset = VectorDataset.objects.create(
+            name="Schools", cluster=Cluster.objects.create(name="Education")
+        )
+        east_gaua = AreaCouncil.objects.get(name="East Gaua").geometry
+        self.inside = VectorItem.objects.create(
+            dataset=self.dataset, geometry=east_gaua.point_on_surface
+        )
+        self.named = VectorItem.objects.create(
+            dataset=self.dataset,
+            geometry=east_gaua.point_on_surface,
+            province=Province.objects.get(name="TAFEA"),
+        )
+        self.outside = VectorItem.objects.create(
+            dataset=self.dataset, geometry=Point(0, 0)
+        )
+
+    def test_assign_regions(self):
+        provinces, area_councils = assign_vector_item_regions(self.dataset)
+        self.assertEqual(area_councils, 1)
+        self.inside.refresh_from_db()
+        self.assertEqual(self.inside.province.name, "TORBA")
+        self.assertEqual(self.inside.area_council.name, "East Gaua")
+        # regions already set are kept, and East Gaua is not in TAFEA
+        self.named.refresh_from_db()
+        self.assertEqual(self.named.province.name, "TAFEA")
+        self.assertIsNone(self.named.area_council)
+        self.outside.refresh_from_db()
+        self.assertIsNone(self.outside.province)
+        self.assertIsNone(self.outside.area_council)
+
+    def test_overwrite(self):
+        assign_vector_item_regions(self.dataset, overwrite=True)
+        self.named.refresh_from_db()
+        self.assertEqual(self.named.province.name, "TORBA")
+        self.assertEqual(self.named.area_council.name, "East Gaua")
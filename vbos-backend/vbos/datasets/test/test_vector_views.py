@@ -1,8 +1,12 @@
+import json
+
 from django.contrib.gis.geos import LineString, Point, Polygon
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from ...users.test.factories import UserFactory
 from ..models import AreaCouncil, Cluster, Province, VectorDataset, VectorItem
 
 
@@ -127,6 +131,79 @@ class TestVectorDatasetDataView(APITestCase):
             ],
         }
 
+    def test_cursor_pagination(self):
+        self.client.force_authenticate(user=UserFactory())
+        req = self.client.get(self.url, {"pagination": "cursor", "page_size": 1})
+        assert req.status_code == status.HTTP_200_OK
+        assert req.data.get("type") == "FeatureCollection"
+        assert "count" not in req.data
+        assert len(req.data.get("features")) == 1
+        assert req.data.get("features")[0]["properties"]["name"] == "Point 1"
+
+        req = self.client.get(req.data.get("next"))
+        assert req.status_code == status.HTTP_200_OK
+        assert len(req.data.get("features")) == 1
+        assert req.data.get("features")[0]["properties"]["name"] == "Line 1"
+        assert req.data.get("next") is None
+
+    def test_export(self):
+        self.client.force_authenticate(user=UserFactory())
+        url = reverse("datasets:vector-export", args=[self.dataset_1.id])
+        req = self.client.get(url)
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["Content-Type"] == "application/geo+json"
+        data = json.loads(b"".join(req.streaming_content))
+        assert data["type"] == "FeatureCollection"
+        assert len(data["features"]) == 2
+        assert data["features"][0]["geometry"] == {
+            "type": "Point",
+            "coordinates": [80.5, 10.232],
+        }
+        assert data["features"][0]["properties"]["province"] == "TORBA"
+
+        req = self.client.get(url, {"output": "ndjson", "in_bbox": "80,10,81,11"})
+        assert req.status_code == status.HTTP_200_OK
+        lines = b"".join(req.streaming_content).decode().splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["properties"]["name"] == "Point 1"
+
+    def test_postgis_geojson(self):
+        self.client.force_authenticate(user=UserFactory())
+        export_url = reverse("datasets:vector-export", args=[self.dataset_2.id])
+        responses = {}
+        for enabled in [True, False]:
+            with override_settings(POSTGIS_GEOJSON=enabled):
+                data = self.client.get(self.url).data
+                export = json.loads(
+                    b"".join(self.client.get(export_url).streaming_content)
+                )
+                responses[enabled] = json.loads(json.dumps(data)), export
+
+        assert responses[True] == responses[False]
+        data, export = responses[True]
+        assert data["features"][0]["geometry"] == {
+            "type": "Point",
+            "coordinates": [80.5, 10.232],
+        }
+        assert export["features"][0]["properties"]["province"] == "TAFEA"
+        assert export["features"][1]["properties"]["province"] is None
+
+    def test_precision(self):
+        self.client.force_authenticate(user=UserFactory())
+        for enabled in [True, False]:
+            with override_settings(POSTGIS_GEOJSON=enabled):
+                req = self.client.get(self.url, {"precision": 1})
+                assert req.status_code == status.HTTP_200_OK
+                assert req.data["features"][0]["geometry"]["coordinates"] == [
+                    80.5,
+                    10.2,
+                ]
+
+        req = self.client.get(self.url, {"precision": "full"})
+        assert req.status_code == status.HTTP_400_BAD_REQUEST
+        req = self.client.get(self.url, {"precision": 16})
+        assert req.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_filters(self):
         req = self.client.get(self.url, {"in_bbox": "80,10,81,11"})
         assert req.status_code == status.HTTP_200_OK
@@ -172,3 +249,54 @@ class TestVectorDatasetDataView(APITestCase):
         )
         assert req.status_code == status.HTTP_200_OK
         assert req.data.get("count") == 1
+
+
+class TestVectorDatasetTileView(APITestCase):
+    def setUp(self):
+        self.dataset = VectorDataset.objects.create(
+            name="Boundaries", cluster=Cluster.objects.create(name="Administrative")
+        )
+        VectorItem.objects.create(
+            dataset=self.dataset,
+            geometry=Point(168.3, -17.7),
+            name="Port Vila",
+            metadata={"population": 50000},
+        )
+        self.client.force_authenticate(user=UserFactory())
+
+    def tile_url(self, z, x, y, pk=None):
+        return reverse("datasets:vector-tile", args=[pk or self.dataset.id, z, x, y])
+
+    def test_tile(self):
+        req = self.client.get(self.tile_url(0, 0, 0))
+        assert req.status_code == status.HTTP_200_OK
+        assert req.headers["Content-Type"] == "application/vnd.mapbox-vector-tile"
+        assert b"Port Vila" in req.content
+        assert req.headers["ETag"]
+
+        req = self.client.get(
+            self.tile_url(0, 0, 0), HTTP_IF_NONE_MATCH=req.headers["ETag"]
+        )
+        assert req.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # tile on the other side of the world
+        req = self.client.get(self.tile_url(1, 0, 0))
+        assert req.status_code == status.HTTP_200_OK
+        assert req.content == b""
+
+    def test_tile_buffer(self):
+        # Just east of tile 1/0/0, within the 64/4096 buffer of its eastern edge
+        VectorItem.objects.create(
+            dataset=self.dataset,
+            geometry=LineString((0.5, 10), (0.5, 20)),
+            name="Buffered road",
+        )
+        req = self.client.get(self.tile_url(1, 0, 0))
+        assert req.status_code == status.HTTP_200_OK
+        assert b"Buffered road" in req.content
+
+    def test_invalid_tile(self):
+        req = self.client.get(self.tile_url(1, 2, 0))
+        assert req.status_code == status.HTTP_404_NOT_FOUND
+        req = self.client.get(self.tile_url(0, 0, 0, pk=self.dataset.id + 1))
+        assert req.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,252 @@
+import gzip
+import hashlib
+import tempfile
+
+from django.contrib.gis.db.models import Extent
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+
+from .models import PMTilesDataset, VectorDataset, VectorItem
+
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MAX_TILE_ZOOM = 22
+# Name of the layer holding the VectorItems in the tiles
+VECTOR_TILE_LAYER = "items"
+VECTOR_TILE_FIELDS = {
+    "id": "Number",
+    "name": "String",
+    "ref": "String",
+    "attribute": "String",
+    "province": "String",
+    "area_council": "String",
+}
+# Half the width of the Web Mercator world, in meters
+WEB_MERCATOR_ORIGIN = 20037508.342789244
+# Archives are saved under the hash of their content, so that an updated archive
+# gets a new URL instead of being hidden by cached copies of the previous one
+PMTILES_UPLOAD_NAME = "pmtiles/vector-{}-{}.pmtiles"
+# Fixed name of the archives built before they were named after their content
+PMTILES_LEGACY_UPLOAD_NAME = "pmtiles/vector-{}.pmtiles"
+PMTILES_MIN_ZOOM = 0
+PMTILES_MAX_ZOOM = 12
+
+VECTOR_TILE_SQL = """
+WITH bounds AS (
+    SELECT
+        ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom,
+        -- Also select the features that only reach into the buffer of the tile
+        ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margin)s) AS buffered
+),
+features AS (
+    SELECT
+        ST_AsMVTGeom(
+            ST_Transform(item.geometry, 3857),
+            bounds.geom,
+            %(extent)s,
+            %(buffer)s,
+            true
+        ) AS geom,
+        item.id,
+        item.name,
+        item.ref,
+        item.attribute,
+        province.name AS province,
+        area_council.name AS area_council,
+        item.metadata
+    FROM datasets_vectoritem item
+    JOIN bounds
+        ON item.geometry && ST_Transform(bounds.buffered, 4326)
+    LEFT JOIN datasets_province province
+        ON province.id = item.province_id
+    LEFT JOIN datasets_areacouncil area_council
+        ON area_council.id = item.area_council_id
+    WHERE item.dataset_id = %(dataset)s
+)
+SELECT ST_AsMVT(features.*, %(layer)s, %(extent)s, 'geom', 'id')
+FROM features
+WHERE features.geom IS NOT NULL
+"""
+
+# Tiles intersecting the bounding box of at least one item of the dataset
+VECTOR_TILE_COORDINATES_SQL = """
+WITH boxes AS (
+    SELECT Box2D(ST_Transform(geometry, 3857)) AS box
+    FROM datasets_vectoritem
+    WHERE dataset_id = %(dataset)s
+)
+SELECT DISTINCT x, y
+FROM boxes,
+    generate_series(
+        GREATEST(floor((ST_XMin(box) + %(origin)s) / %(size)s)::int, 0),
+        LEAST(floor((ST_XMax(box) + %(origin)s) / %(size)s)::int, %(max)s)
+    ) AS x,
+    generate_series(
+        GREATEST(floor((%(origin)s - ST_YMax(box)) / %(size)s)::int, 0),
+        LEAST(floor((%(origin)s - ST_YMin(box)) / %(size)s)::int, %(max)s)
+    ) AS y
+"""
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def vector_tile(dataset_id: int, z: int, x: int, y: int) -> bytes:
+    """
+    Encode the VectorItems of a dataset intersecting tile z/x/y, or its MVT_BUFFER,
+    as a Mapbox Vector Tile with PostGIS ST_AsMVT. Item fields and metadata keys
+    become properties.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            VECTOR_TILE_SQL,
+            {
+                "z": z,
+                "x": x,
+                "y": y,
+                "extent": MVT_EXTENT,
+                "buffer": MVT_BUFFER,
+                "margin": MVT_BUFFER / MVT_EXTENT,
+                "layer": VECTOR_TILE_LAYER,
+                "dataset": dataset_id,
+            },
+        )
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+def vector_tile_coordinates(dataset_id: int, z: int) -> list:
+    """(x, y) of the tiles of zoom z that may contain items of the dataset."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            VECTOR_TILE_COORDINATES_SQL,
+            {
+                "dataset": dataset_id,
+                "origin": WEB_MERCATOR_ORIGIN,
+                "size": 2 * WEB_MERCATOR_ORIGIN / 2**z,
+                "max": 2**z - 1,
+            },
+        )
+        return cursor.fetchall()
+
+
+def write_vector_pmtiles(
+    dataset: VectorDataset,
+    file,
+    min_zoom: int = PMTILES_MIN_ZOOM,
+    max_zoom: int = PMTILES_MAX_ZOOM,
+) -> int:
+    """
+    Write the VectorItems of a dataset to ``file`` as a PMTiles archive of
+    gzipped vector tiles, from zoom min_zoom to max_zoom. Tiles are encoded one
+    at a time by PostGIS and only empty tiles are skipped. Returns the number of
+    tiles written.
+    """
+    extent = VectorItem.objects.filter(dataset=dataset).aggregate(
+        extent=Extent("geometry")
+    )["extent"]
+    if extent is None:
+        raise ValueError(f"VectorDataset {dataset.pk} has no items.")
+
+    writer = Writer(file)
+    count = 0
+    for z in range(min_zoom, max_zoom + 1):
+        # The archive is clustered when tiles are written in tile id order
+        tiles = sorted(
+            (zxy_to_tileid(z, x, y), x, y)
+            for x, y in vector_tile_coordinates(dataset.pk, z)
+        )
+        for tile_id, x, y in tiles:
+            tile = vector_tile(dataset.pk, z, x, y)
+            if tile:
+                writer.write_tile(tile_id, gzip.compress(tile))
+                count += 1
+
+    min_lon, min_lat, max_lon, max_lat = extent
+    writer.finalize(
+        {
+            "tile_type": TileType.MVT,
+            "tile_compression": Compression.GZIP,
+            "min_zoom": min_zoom,
+            "max_zoom": max_zoom,
+            "min_lon_e7": int(min_lon * 10**7),
+            "min_lat_e7": int(min_lat * 10**7),
+            "max_lon_e7": int(max_lon * 10**7),
+            "max_lat_e7": int(max_lat * 10**7),
+            "center_zoom": min_zoom,
+            "center_lon_e7": int((min_lon + max_lon) / 2 * 10**7),
+            "center_lat_e7": int((min_lat + max_lat) / 2 * 10**7),
+        },
+        {
+            "name": dataset.name,
+            "description": dataset.description or "",
+            "attribution": dataset.source or "",
+            "vector_layers": [
+                {
+                    "id": VECTOR_TILE_LAYER,
+                    "fields": VECTOR_TILE_FIELDS,
+                    "minzoom": min_zoom,
+                    "maxzoom": max_zoom,
+                }
+            ],
+        },
+    )
+    return count
+
+
+def build_vector_pmtiles(
+    dataset: VectorDataset,
+    min_zoom: int = PMTILES_MIN_ZOOM,
+    max_zoom: int = PMTILES_MAX_ZOOM,
+) -> PMTilesDataset:
+    """
+    Build a PMTiles archive of a VectorDataset and save it with default_storage
+    under a name holding the hash of its content. Create or update the
+    PMTilesDataset linked to the VectorDataset (or, for archives built before
+    that link existed, the unlinked one with its name, type and cluster) to
+    point at it, then delete the previous archive.
+    """
+    with tempfile.TemporaryFile() as file:
+        write_vector_pmtiles(dataset, file, min_zoom, max_zoom)
+        file.seek(0)
+        digest = hashlib.file_digest(file, "sha256").hexdigest()[:16]
+        name = PMTILES_UPLOAD_NAME.format(dataset.pk, digest)
+        # An archive with the same name has the same content
+        if not default_storage.exists(name):
+            file.seek(0)
+            name = default_storage.save(name, File(file))
+
+    pmtiles_dataset = (
+        PMTilesDataset.objects.filter(source_dataset=dataset).first()
+        or PMTilesDataset.objects.filter(
+            source_dataset__isnull=True,
+            name=dataset.name,
+            type=dataset.type,
+            cluster=dataset.cluster,
+        ).first()
+        or PMTilesDataset()
+    )
+    previous_name = pmtiles_dataset.file_name
+    legacy_name = PMTILES_LEGACY_UPLOAD_NAME.format(dataset.pk)
+    if not previous_name and pmtiles_dataset.url == default_storage.url(legacy_name):
+        previous_name = legacy_name
+
+    pmtiles_dataset.source_dataset = dataset
+    pmtiles_dataset.name = dataset.name
+    pmtiles_dataset.type = dataset.type
+    pmtiles_dataset.cluster = dataset.cluster
+    pmtiles_dataset.description = dataset.description
+    pmtiles_dataset.source = dataset.source
+    pmtiles_dataset.url = default_storage.url(name)
+    pmtiles_dataset.source_layer = VECTOR_TILE_LAYER
+    pmtiles_dataset.file_name = name
+    pmtiles_dataset.save()
+
+    if previous_name and previous_name != name:
+        default_storage.delete(previous_name)
+    return pmtiles_dataset
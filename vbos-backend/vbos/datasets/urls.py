@@ -43,6 +43,16 @@ urlpatterns = [
         views.VectorDatasetDataView.as_view(),
         name="vector-data",
     ),
+    path(
+        "vector/<int:pk>/export/",
+        views.VectorDatasetExportView.as_view(),
+        name="vector-export",
+    ),
+    path(
+        "vector/<int:pk>/tiles/<int:z>/<int:x>/<int:y>.mvt",
+        views.VectorDatasetTileView.as_view(),
+        name="vector-tile",
+    ),
     # tabular
     path("tabular/", views.TabularDatasetListView.as_view(), name="tabular-list"),
     path(
@@ -55,6 +65,16 @@ urlpatterns = [
         views.TabularDatasetDataView.as_view(),
         name="tabular-data",
     ),
+    path(
+        "tabular/<int:pk>/export/",
+        views.TabularDatasetExportView.as_view(),
+        name="tabular-export",
+    ),
+    path(
+        "tabular/<int:pk>/aggregates/",
+        views.TabularDatasetAggregateView.as_view(),
+        name="tabular-aggregates",
+    ),
     path(
         "tabular/<int:pk>/data-xlsx/",
         views.TabularDatasetXSLXDataView.as_view(),
@@ -1,14 +1,48 @@
 import calendar
+import hashlib
+import json
+import math
+import struct
+import sys
+from array import array
 from datetime import date
+from io import TextIOWrapper
+from itertools import islice
 from typing import Dict, List
 
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos.geometry import GEOSGeometry
+from django.db import connection, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    Func,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Sum,
+    Value,
+)
+from django.db.models.functions import ExtractYear
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_namespace, dataset_namespace, namespace_version
 from .models import (
+    SIMPLIFICATION_TOLERANCES,
+    SIMPLIFIED_GEOMETRY_FIELDS,
     TYPE_CHOICES,
     AreaCouncil,
     Cluster,
     Province,
+    TabularAggregate,
     TabularDataset,
     TabularItem,
+    VectorDataset,
+    VectorItem,
 )
 
 
@@ -180,111 +214,935 @@ def parse_value(raw: str):
         raise ValueError(f"Cannot convert to number: {raw!r}")
 
 
-def _resolve_region_to_province_and_ac(region_name: str):
-    """Map region name to Province and/or AreaCouncil. Returns (province, area_council)."""
-    if not region_name or not str(region_name).strip():
-        return None, None
-    name = str(region_name).strip()
-    if name.lower() == "national":
+def normalise_region_name(name) -> str:
+    """Lowercase and collapse whitespace so e.g. ' east  GAUA' matches 'East Gaua'."""
+    return " ".join(str(name or "").split()).lower()
+
+
+class RegionIndex:
+    """
+    In-memory lookup of provinces and area councils by normalised name.
+    Loaded once (without geometries) and shared by all importers, so resolving
+    a region name does not hit the database. Use get_region_index() to get an
+    up-to-date instance.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        provinces = list(
+            Province.objects.defer("geometry", *SIMPLIFIED_GEOMETRY_FIELDS)
+        )
+        self.provinces_by_id = {p.id: p for p in provinces}
+        self.provinces = {normalise_region_name(p.name): p for p in provinces}
+        self.area_councils = {}
+        for ac in AreaCouncil.objects.defer("geometry", *SIMPLIFIED_GEOMETRY_FIELDS):
+            # Reuse the loaded province so ac.province doesn't trigger a query
+            ac.province = self.provinces_by_id[ac.province_id]
+            self.area_councils[normalise_region_name(ac.name)] = ac
+
+    def province(self, name):
+        return self.provinces.get(normalise_region_name(name))
+
+    def area_council(self, name):
+        return self.area_councils.get(normalise_region_name(name))
+
+    def resolve(self, region_name):
+        """Map a region name to (province, area_council), trying provinces first."""
+        name = normalise_region_name(region_name)
+        if not name or name == "national":
+            return None, None
+        province = self.provinces.get(name)
+        if province:
+            return province, None
+        ac = self.area_councils.get(name)
+        if ac:
+            return ac.province, ac
         return None, None
-    # Try province first
-    province = Province.objects.filter(name__iexact=name).first()
-    if province:
-        return province, None
-    # Try area council
-    ac = AreaCouncil.objects.filter(name__iexact=name).first()
-    if ac:
-        return ac.province, ac
-    return None, None
 
 
-def import_wide_format_csv(reader, dataset: TabularDataset, year: int):
+_region_index = None
+
+
+def get_region_index() -> RegionIndex:
+    """
+    Return the shared RegionIndex, rebuilding it if a Province or AreaCouncil
+    changed since it was loaded (in this or another process).
+    """
+    global _region_index
+    version = namespace_version("regions")
+    if _region_index is None or _region_index.version != version:
+        _region_index = RegionIndex(version)
+    return _region_index
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+@receiver(post_save, sender=AreaCouncil)
+@receiver(post_delete, sender=AreaCouncil)
+def invalidate_region_index(sender, **kwargs):
+    global _region_index
+    _region_index = None
+    bump_namespace("regions")
+
+
+def simplify_region_geometries(queryset=None):
+    """
+    Recompute the simplified geometries (SIMPLIFIED_GEOMETRY_FIELDS) of the given
+    Province or AreaCouncil queryset, or of all regions, with one UPDATE per model.
+    """
+    updates = {
+        f"geometry_simplified_{level}": Func(
+            F("geometry"),
+            Value(tolerance),
+            function="ST_SimplifyPreserveTopology",
+            output_field=GeometryField(),
+        )
+        for level, tolerance in SIMPLIFICATION_TOLERANCES.items()
+    }
+    querysets = (
+        [queryset]
+        if queryset is not None
+        else [Province.objects.all(), AreaCouncil.objects.all()]
+    )
+    count = sum(qs.update(**updates) for qs in querysets)
+    # update() sends no signals
+    bump_namespace("regions")
+    return count
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_save, sender=AreaCouncil)
+def simplify_saved_region(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "geometry" in update_fields:
+        simplify_region_geometries(sender.objects.filter(pk=instance.pk))
+
+
+TABULAR_IMPORT_CHUNK_SIZE = 5000
+
+
+def chunked(iterable, size: int):
+    """Yield lists of up to ``size`` items from ``iterable`` without materialising it."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _get_cached_dataset(row: Dict, datasets: Dict):
+    """Like get_dataset, but memoised per (Indicator, Cluster, Type) for one import."""
+    key = (row["Indicator"].strip(), row["Cluster"].strip(), row["Type"])
+    if key not in datasets:
+        try:
+            datasets[key] = get_dataset(row)
+        except TabularDataset.DoesNotExist as e:
+            datasets[key] = e
+    if isinstance(datasets[key], Exception):
+        raise datasets[key]
+    return datasets[key]
+
+
+def build_tabular_item(
+    csv_row: CSVRow, dataset: TabularDataset, regions: RegionIndex
+) -> TabularItem:
+    """Build an unsaved TabularItem, resolving regions from the RegionIndex."""
+    attribute = (csv_row.attribute or "").strip() or None
+    value = parse_value(csv_row.value)
+    return TabularItem(
+        dataset=dataset,
+        metadata=csv_row.metadata,
+        attribute=attribute,
+        value=value,
+        date=csv_row.date,
+        province=regions.province(csv_row.province),
+        area_council=regions.area_council(csv_row.area_council),
+    )
+
+
+def tabular_item_natural_key(item: TabularItem) -> str:
+    """
+    Hash of the fields identifying a TabularItem within its dataset, that is all
+    of them but the value: date, attribute, province, area council and metadata.
+    """
+    key = [
+        item.date.isoformat() if item.date else None,
+        item.attribute,
+        item.province_id,
+        item.area_council_id,
+        item.metadata,
+    ]
+    return hashlib.md5(
+        json.dumps(key, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def key_tabular_items(dataset, chunk_size: int = TABULAR_IMPORT_CHUNK_SIZE) -> int:
+    """
+    Set the natural_key of the items of a dataset imported without one, deleting
+    those whose key is already taken by an older item, so that upserts match
+    every existing row. Returns the number of deleted duplicates.
+    """
+    items = TabularItem.objects.filter(dataset=dataset)
+    keys = set(
+        items.filter(natural_key__isnull=False).values_list("natural_key", flat=True)
+    )
+    unkeyed = (
+        items.filter(natural_key__isnull=True)
+        .only("id", "date", "attribute", "province", "area_council", "metadata")
+        .order_by("id")
+    )
+    duplicates = []
+    for chunk in chunked(unkeyed.iterator(chunk_size=chunk_size), chunk_size):
+        keyed = []
+        for item in chunk:
+            item.natural_key = tabular_item_natural_key(item)
+            if item.natural_key in keys:
+                duplicates.append(item.pk)
+            else:
+                keys.add(item.natural_key)
+                keyed.append(item)
+        TabularItem.objects.bulk_update(keyed, ["natural_key"])
+
+    for ids in chunked(duplicates, CLEAN_BATCH_SIZE):
+        TabularItem.objects.filter(id__in=ids).delete()
+    return len(duplicates)
+
+
+UPSERT_TABULAR_ITEMS_SQL = """
+INSERT INTO datasets_tabularitem (
+    dataset_id, date, attribute, value, province_id, area_council_id, metadata,
+    natural_key
+)
+VALUES {values}
+ON CONFLICT (dataset_id, natural_key) DO UPDATE SET value = EXCLUDED.value
+WHERE datasets_tabularitem.value IS DISTINCT FROM EXCLUDED.value
+RETURNING (xmax = 0)
+"""
+
+
+def upsert_tabular_items(items: List[TabularItem]):
+    """
+    Write TabularItems with one INSERT ... ON CONFLICT DO UPDATE on their natural
+    key: new items are inserted, and existing ones rewritten only if their value
+    changed. Returns (inserted_count, updated_count).
+    """
+    # A statement can't update a row twice: the last of the items sharing a key wins
+    unique = list(
+        {
+            (item.dataset_id, tabular_item_natural_key(item)): item for item in items
+        }.items()
+    )
+    params = []
+    for (dataset_id, natural_key), item in unique:
+        params += [
+            dataset_id,
+            item.date,
+            item.attribute,
+            item.value,
+            item.province_id,
+            item.area_council_id,
+            json.dumps(item.metadata),
+            natural_key,
+        ]
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s::jsonb, %s)"] * len(unique))
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_TABULAR_ITEMS_SQL.format(values=values), params)
+        inserted = [row[0] for row in cursor.fetchall()]
+    return inserted.count(True), inserted.count(False)
+
+
+def parse_value_column(cells, parsed: Dict = None) -> List:
+    """
+    parse_value() over a column of raw cells. Each distinct cell is parsed once,
+    memoised in ``parsed``. Returns one entry per cell: the float, None for an
+    empty cell, or the ValueError raised for an unparseable one.
+    """
+    if parsed is None:
+        parsed = {}
+    column = []
+    for cell in cells:
+        if cell not in parsed:
+            if cell is None or not str(cell).strip():
+                parsed[cell] = None
+            else:
+                try:
+                    parsed[cell] = parse_value(cell)
+                except ValueError as e:
+                    parsed[cell] = e
+        column.append(parsed[cell])
+    return column
+
+
+def import_wide_format_csv(
+    reader,
+    dataset: TabularDataset,
+    year: int,
+    progress=None,
+    chunk_size: int = TABULAR_IMPORT_CHUNK_SIZE,
+    upsert: bool = False,
+    stats: Dict = None,
+):
     """
     Import CSV in wide format: first column = Region, other columns = attributes with values.
-    Yields (created_count, error_count, first_error).
+    Rows are melted in chunks of about ``chunk_size`` cells: the value matrix of a
+    chunk is parsed column by column, each region is resolved once per import, and
+    the non-empty cells are written with a single bulk_create (or upsert), all
+    inside one transaction. The row following the header is skipped.
+    If given, ``progress`` is called after each chunk with
+    (rows_processed, created, errors, first_error), and ``stats`` is updated
+    with the final rows_processed, duplicates_deleted (see key_tabular_items())
+    and the aggregate groups of the written items (see tabular_aggregate_group()).
+    Returns (created_count, error_count, first_error).
     """
-    rows = list(reader)
-    if not rows:
+    rows = iter(reader)
+    first_row = next(rows, None)
+    if first_row is None:
         return 0, 0, None
 
-    headers = list(rows[0].keys())
+    headers = list(first_row.keys())
     region_col = headers[0]
     value_cols = [h for h in headers[1:] if h and h.strip()]
+    attributes = [col.strip() for col in value_cols]
+    item_date = date(year, 1, 1)
+
+    index = get_region_index()
+    regions = {}
+    parsed = {}
+    rows_per_chunk = max(1, chunk_size // max(1, len(value_cols)))
 
+    rows_processed = 0
     created_count = 0
     error_count = 0
     first_error = None
+    duplicates_deleted = 0
+    groups = set()
 
-    for row in rows[1:]:
-        region = row.get(region_col, "").strip()
-        province, area_council = _resolve_region_to_province_and_ac(region)
+    with transaction.atomic():
+        if upsert:
+            duplicates_deleted = key_tabular_items(dataset)
 
-        for col in value_cols:
-            raw_value = row.get(col, "")
-            if not str(raw_value).strip():
-                continue  # Skip empty cells in wide format
-            try:
-                value = parse_value(raw_value)
-            except ValueError as e:
-                error_count += 1
-                if first_error is None:
-                    first_error = str(e)
-                continue
-
-            attribute = (col or "").strip() or None
+        for chunk in chunked(rows, rows_per_chunk):
+            region_names = [(row.get(region_col) or "").strip() for row in chunk]
+            for name in region_names:
+                if name not in regions:
+                    regions[name] = index.resolve(name)
+            columns = [
+                parse_value_column([row.get(col) for row in chunk], parsed)
+                for col in value_cols
+            ]
+
+            items = []
+            # Transposed back, so items keep the order of the cells in the file
+            for region, values in zip(region_names, zip(*columns)):
+                province, area_council = regions[region]
+                for attribute, value in zip(attributes, values):
+                    if value is None:
+                        continue  # Skip empty cells in wide format
+                    if isinstance(value, ValueError):
+                        error_count += 1
+                        if first_error is None:
+                            first_error = str(value)
+                        continue
+                    items.append(
+                        TabularItem(
+                            dataset=dataset,
+                            metadata={"region": region},
+                            attribute=attribute,
+                            value=value,
+                            date=item_date,
+                            province=province,
+                            area_council=area_council,
+                        )
+                    )
+
+            if items:
+                try:
+                    # Savepoint so a failed chunk doesn't abort the whole import
+                    with transaction.atomic():
+                        if upsert:
+                            created_count += sum(upsert_tabular_items(items))
+                        else:
+                            TabularItem.objects.bulk_create(items)
+                            created_count += len(items)
+                    groups.update(tabular_aggregate_group(item) for item in items)
+                except Exception as e:
+                    error_count += len(items)
+                    if first_error is None:
+                        first_error = (
+                            f"Rows {rows_processed + 1}-{rows_processed + len(chunk)}: {e}"
+                        )
+
+            rows_processed += len(chunk)
+            if progress:
+                progress(rows_processed, created_count, error_count, first_error)
+
+    if stats is not None:
+        stats.update(
+            rows_processed=rows_processed,
+            duplicates_deleted=duplicates_deleted,
+            groups=groups,
+        )
+    return created_count, error_count, first_error
+
+
+def import_long_format_csv(
+    reader,
+    dataset: TabularDataset = None,
+    chunk_size: int = TABULAR_IMPORT_CHUNK_SIZE,
+    progress=None,
+    datasets: Dict = None,
+    upsert: bool = False,
+    stats: Dict = None,
+):
+    """
+    Import CSV in long format (one value per row) using bulk inserts.
+    Rows are parsed in chunks and each chunk is written with a single bulk_create,
+    all inside one transaction. If no dataset is given, it is looked up from the
+    Indicator, Cluster and Type columns of each row and memoised in ``datasets``.
+    With ``upsert``, chunks are written with upsert_tabular_items() instead, so
+    re-importing a file only inserts new rows and updates changed values; the
+    count of created items is then the number of rows inserted or updated.
+    If given, ``progress`` is called after each chunk with
+    (rows_processed, created, errors, first_error), and ``stats`` is updated
+    with the final rows_processed, duplicates_deleted (see key_tabular_items())
+    and the aggregate groups of the written items (see tabular_aggregate_group()).
+    Returns (created_count, error_count, first_error).
+    """
+    regions = get_region_index()
+    if datasets is None:
+        datasets = {}
+    keyed_datasets = set()
+
+    rows_processed = 0
+    created_count = 0
+    error_count = 0
+    first_error = None
+    duplicates_deleted = 0
+    groups = set()
+
+    with transaction.atomic():
+        for chunk in chunked(reader, chunk_size):
+            items = []
+            for row in chunk:
+                try:
+                    row_dataset = dataset or _get_cached_dataset(row, datasets)
+                    items.append(
+                        build_tabular_item(CSVRow(row), row_dataset, regions)
+                    )
+                except Exception as e:
+                    error_count += 1
+                    if first_error is None:
+                        first_error = str(e)
+
+            if upsert:
+                for item_dataset in {item.dataset for item in items}:
+                    if item_dataset.pk not in keyed_datasets:
+                        duplicates_deleted += key_tabular_items(item_dataset)
+                        keyed_datasets.add(item_dataset.pk)
+
+            if items:
+                try:
+                    # Savepoint so a failed chunk doesn't abort the whole import
+                    with transaction.atomic():
+                        if upsert:
+                            created_count += sum(upsert_tabular_items(items))
+                        else:
+                            TabularItem.objects.bulk_create(items)
+                            created_count += len(items)
+                    groups.update(tabular_aggregate_group(item) for item in items)
+                except Exception as e:
+                    error_count += len(items)
+                    if first_error is None:
+                        first_error = (
+                            f"Rows {rows_processed + 1}-{rows_processed + len(chunk)}: {e}"
+                        )
+
+            rows_processed += len(chunk)
+            if progress:
+                progress(rows_processed, created_count, error_count, first_error)
+
+    if stats is not None:
+        stats.update(
+            rows_processed=rows_processed,
+            duplicates_deleted=duplicates_deleted,
+            groups=groups,
+        )
+    return created_count, error_count, first_error
+
+
+NEWLINE_DELIMITED_GEOJSON_EXTENSIONS = (".geojsonl", ".geojsons", ".ndjson")
+GEOJSON_READ_SIZE = 64 * 1024
+# Longest partial token at the end of a buffer, e.g. "-Infinit" or "\u12A"
+GEOJSON_TRUNCATION_MARGIN = 8
+VECTOR_IMPORT_CHUNK_SIZE = 1000
+
+
+class GeoJSONFeatureReader:
+    """
+    Iterate over the features of a GeoJSON FeatureCollection read from a text
+    stream, keeping only the current feature and a small read buffer in memory.
+    """
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, stream, read_size: int = GEOJSON_READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if key == "features":
+                yield from self._iter_array()
+            else:
+                self._decode()  # type, name, crs, bbox...
+            if self._expect(",}") == "}":
+                return
+
+    def _iter_array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._decode()
+            if self._expect(",]") == "]":
+                return
+
+    def _read(self, size: int) -> bool:
+        data = self.stream.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the stream."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read(self.read_size):
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Invalid GeoJSON: expected one of {chars!r}, found {char or 'end of file'!r}"
+            )
+        self.pos += 1
+        return char
+
+    def _decode(self):
+        """Decode the next JSON value, reading more data until it is complete."""
+        self._peek()
+        size = self.read_size
+        while True:
             try:
-                from datetime import date
-
-                TabularItem.objects.create(
-                    dataset=dataset,
-                    metadata={"region": region},
-                    attribute=attribute,
-                    value=value,
-                    date=date(year, 1, 1),
-                    province=province,
-                    area_council=area_council,
-                )
-                created_count += 1
-            except Exception as e:
-                error_count += 1
-                if first_error is None:
-                    first_error = str(e)
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Reading on can't fix an error before the end of the buffer
+                if self.eof or not self._is_truncation(e):
+                    raise
+            else:
+                # A number at the very end of the buffer may continue in the next read
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            self._read(size)
+            size *= 2  # grow the reads so very large features parse in few attempts
+
+    def _is_truncation(self, error: json.JSONDecodeError) -> bool:
+        """
+        Whether a decoding error may only come from the value continuing past the
+        buffer: it is within the last few characters (a partial literal, number or
+        escape), or in a string left open.
+        """
+        near_end = error.pos >= len(self.buffer) - GEOJSON_TRUNCATION_MARGIN
+        return near_end or error.msg.startswith("Unterminated string")
+
+
+def iter_geojson_features(stream, newline_delimited: bool = False):
+    """
+    Yield the features of a GeoJSON FeatureCollection, or of newline-delimited
+    GeoJSON (one Feature per line), from a text stream one at a time.
+    """
+    if not newline_delimited:
+        yield from GeoJSONFeatureReader(stream)
+        return
+    for line in stream:
+        line = line.strip().lstrip("\x1e")  # also accept RFC 8142 text sequences
+        if line:
+            yield json.loads(line)
+
+
+_WKB_BYTE_ORDER = 1 if sys.byteorder == "little" else 0
+_WKB_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+    "GeometryCollection": 7,
+}
+
+
+def _wkb_points(points, out: List):
+    out.append(struct.pack("=I", len(points)))
+    out.append(array("d", [ordinate for x, y, *_ in points for ordinate in (x, y)]))
+
+
+def _wkb_geometry(geom_type: str, geometry, out: List):
+    out.append(struct.pack("=BI", _WKB_BYTE_ORDER, _WKB_TYPES[geom_type]))
+    if geom_type == "GeometryCollection":
+        out.append(struct.pack("=I", len(geometry["geometries"])))
+        for part in geometry["geometries"]:
+            _wkb_geometry(part["type"], part, out)
+        return
+
+    coordinates = geometry["coordinates"] if isinstance(geometry, dict) else geometry
+    if geom_type == "Point":
+        x, y = coordinates[:2] if coordinates else (math.nan, math.nan)
+        out.append(array("d", (x, y)))
+    elif geom_type == "LineString":
+        _wkb_points(coordinates, out)
+    elif geom_type == "Polygon":
+        out.append(struct.pack("=I", len(coordinates)))
+        for ring in coordinates:
+            _wkb_points(ring, out)
+    else:
+        # Multi* geometries are a count followed by complete single geometries
+        out.append(struct.pack("=I", len(coordinates)))
+        for part in coordinates:
+            _wkb_geometry(geom_type[len("Multi") :], part, out)
+
+
+def geometry_from_geojson(geometry: Dict) -> GEOSGeometry:
+    """
+    Build a 2D GEOS geometry from a parsed GeoJSON geometry. The coordinates are
+    packed into WKB directly instead of being serialised back to a JSON string.
+    """
+    out = []
+    _wkb_geometry(geometry["type"], geometry, out)
+    wkb = b"".join(part if isinstance(part, bytes) else part.tobytes() for part in out)
+    return GEOSGeometry(memoryview(wkb), srid=4326)
+
+
+def build_vector_item(
+    feature: Dict, dataset: VectorDataset, regions: RegionIndex
+) -> VectorItem:
+    """Build an unsaved VectorItem from a parsed GeoJSON feature."""
+    metadata = GeoJSONProperties(feature.get("properties") or {})
+    return VectorItem(
+        dataset=dataset,
+        metadata=metadata.properties,
+        name=metadata.name.strip() if metadata.name else None,
+        ref=metadata.ref,
+        attribute=metadata.attribute.strip() if metadata.attribute else None,
+        province=regions.province(metadata.province),
+        area_council=regions.area_council(metadata.area_council),
+        geometry=geometry_from_geojson(feature["geometry"]),
+    )
+
+
+# Items are placed at a point guaranteed to lie on them, so lines and polygons
+# crossing a boundary get a single region
+ASSIGN_PROVINCE_SQL = """
+UPDATE datasets_vectoritem AS item
+SET province_id = province.id
+FROM datasets_province AS province
+WHERE item.dataset_id = %(dataset)s
+    AND (%(overwrite)s OR item.province_id IS NULL)
+    AND ST_Intersects(province.geometry, ST_PointOnSurface(item.geometry))
+"""
+ASSIGN_AREA_COUNCIL_SQL = """
+UPDATE datasets_vectoritem AS item
+SET area_council_id = area_council.id,
+    province_id = area_council.province_id
+FROM datasets_areacouncil AS area_council
+WHERE item.dataset_id = %(dataset)s
+    AND (%(overwrite)s OR item.area_council_id IS NULL)
+    -- Never pair a kept province with an area council of another one
+    AND (
+        %(overwrite)s
+        OR item.province_id IS NULL
+        OR item.province_id = area_council.province_id
+    )
+    AND ST_Intersects(area_council.geometry, ST_PointOnSurface(item.geometry))
+"""
+
+
+def assign_vector_item_regions(dataset, overwrite: bool = False):
+    """
+    Set the province and area council of the VectorItems of a dataset from the
+    region boundaries containing them, with one UPDATE ... FROM per region model
+    using the spatial indexes. Only items without one are updated unless
+    ``overwrite``; items keeping their province only get an area council of that
+    province. Returns (province_count, area_council_count) updated rows.
+    """
+    dataset_id = getattr(dataset, "pk", dataset)
+    params = {"dataset": dataset_id, "overwrite": overwrite}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(ASSIGN_PROVINCE_SQL, params)
+        province_count = cursor.rowcount
+        cursor.execute(ASSIGN_AREA_COUNCIL_SQL, params)
+        area_council_count = cursor.rowcount
+
+    if province_count or area_council_count:
+        bump_namespace(dataset_namespace("vector", dataset_id))
+    return province_count, area_council_count
+
+
+def import_geojson(
+    file,
+    dataset: VectorDataset,
+    progress=None,
+    newline_delimited: bool = False,
+    chunk_size: int = VECTOR_IMPORT_CHUNK_SIZE,
+):
+    """
+    Import the features of a GeoJSON FeatureCollection, or newline-delimited
+    GeoJSON, from a binary file as VectorItems. Features are parsed incrementally
+    and written in chunks with bulk_create inside one transaction, so memory use
+    doesn't depend on the file size. Regions not named in the properties are
+    then assigned from the boundaries with assign_vector_item_regions().
+    Returns (created_count, error_count, first_error).
+    """
+    features = iter_geojson_features(
+        # utf-8-sig also accepts files starting with a byte order mark
+        TextIOWrapper(file, encoding="utf-8-sig"), newline_delimited
+    )
+    regions = get_region_index()
+
+    features_processed = 0
+    created_count = 0
+    error_count = 0
+    first_error = None
+
+    with transaction.atomic():
+        for chunk in chunked(features, chunk_size):
+            items = []
+            for feature in chunk:
+                try:
+                    items.append(build_vector_item(feature, dataset, regions))
+                except Exception as e:
+                    error_count += 1
+                    if first_error is None:
+                        first_error = str(e)
 
+            if items:
+                try:
+                    # Savepoint so a failed chunk doesn't abort the whole import
+                    with transaction.atomic():
+                        VectorItem.objects.bulk_create(items)
+                    created_count += len(items)
+                except Exception as e:
+                    error_count += len(items)
+                    if first_error is None:
+                        first_error = (
+                            f"Features {features_processed + 1}-"
+                            f"{features_processed + len(chunk)}: {e}"
+                        )
+
+            features_processed += len(chunk)
+            if progress:
+                progress(features_processed, created_count, error_count, first_error)
+
+    if created_count:
+        assign_vector_item_regions(dataset)
+        bump_namespace(dataset_namespace("vector", dataset.pk))
     return created_count, error_count, first_error
 
 
 def create_tabular_item(csv_row: CSVRow, dataset: TabularDataset):
-    attribute = (csv_row.attribute or "").strip() or None
-    value = parse_value(csv_row.value)
-    province = (
-        Province.objects.filter(name__iexact=csv_row.province).first()
-        if csv_row.province
-        else None
+    item = build_tabular_item(csv_row, dataset, get_region_index())
+    item.save()
+    return item
+
+
+CLEAN_BATCH_SIZE = 10000
+
+
+def redundant_tabular_items(datasets=None):
+    """
+    Return the TabularItems made redundant by more detailed rows of the same dataset:
+    rows without an Area Council when the dataset has Area Council rows, then rows
+    without a Province when the remaining rows have one. Evaluated for all datasets
+    (or the given ones) at once with EXISTS subqueries.
+    """
+    same_dataset = TabularItem.objects.filter(dataset=OuterRef("dataset"))
+    has_area_council = Exists(same_dataset.filter(area_council__isnull=False))
+    has_area_council_and_province = Exists(
+        same_dataset.filter(area_council__isnull=False, province__isnull=False)
     )
-    area_council = (
-        AreaCouncil.objects.filter(name__iexact=csv_row.area_council).first()
-        if csv_row.area_council
-        else None
+    has_province = Exists(same_dataset.filter(province__isnull=False))
+
+    items = TabularItem.objects.all()
+    if datasets is not None:
+        items = items.filter(dataset__in=datasets)
+    return items.filter(
+        (Q(area_council__isnull=True) & has_area_council)
+        | (
+            Q(province__isnull=True)
+            & (has_area_council_and_province | (~has_area_council & has_province))
+        )
     )
-    return TabularItem.objects.create(
-        dataset=dataset,
-        metadata=csv_row.metadata,
-        attribute=attribute,
-        value=value,
-        date=csv_row.date,
-        province=province,
-        area_council=area_council,
+
+
+def clean_redundant_tabular_items(
+    datasets=None, dry_run: bool = False, batch_size: int = CLEAN_BATCH_SIZE
+):
+    """
+    Delete the redundant TabularItems of the given datasets (all if None), one
+    DELETE statement per batch. Returns {dataset_id: count} of the items deleted,
+    or that would be deleted if dry_run is set.
+    """
+    redundant = redundant_tabular_items(datasets).order_by()
+    counts = dict(redundant.values_list("dataset").annotate(Count("id")))
+    if dry_run or not counts:
+        return counts
+
+    # Deleting redundant rows never changes which other rows are redundant, so
+    # each batch can commit on its own without holding locks for the whole run
+    while True:
+        batch = redundant.values("id")[:batch_size]
+        deleted, _ = TabularItem.objects.filter(id__in=batch).delete()
+        if deleted < batch_size:
+            break
+    refresh_tabular_aggregates(list(counts))
+    return counts
+
+
+def tabular_aggregate_group(item: TabularItem):
+    """
+    (dataset id, year, province id, area council id, attribute) of the
+    TabularAggregate row that counts a TabularItem.
+    """
+    return (
+        item.dataset_id,
+        item.date.year if item.date else None,
+        item.province_id,
+        item.area_council_id,
+        item.attribute,
     )
 
 
-def clean_redundant_tabular_items(dataset: TabularDataset):
-    items = TabularItem.objects.filter(dataset=dataset)
-    # If a dataset has items with an Area Council value,
-    # remove all items that don't have the Area Council set
-    if items.filter(area_council__isnull=False).count() > 0:
-        items.filter(area_council__isnull=True).delete()
-
-    # If a dataset has items with a Province value,
-    # remove all items that don't have the Province set
-    if items.filter(province__isnull=False).count() > 0:
-        items.filter(province__isnull=True).delete()
+def tabular_aggregate_groups(items: QuerySet) -> set:
+    """Aggregate groups (see tabular_aggregate_group()) of a TabularItem queryset."""
+    return set(
+        items.order_by()
+        .values_list(
+            "dataset", ExtractYear("date"), "province", "area_council", "attribute"
+        )
+        .distinct()
+    )
+
+
+AGGREGATE_GROUPS_BATCH_SIZE = 1000
+
+# Groups are matched with IS NOT DISTINCT FROM so that NULL years, provinces, area
+# councils and attributes match each other
+DELETE_AGGREGATE_GROUPS_SQL = """
+DELETE FROM datasets_tabularaggregate agg
+USING (VALUES {values}) AS g (dataset_id, year, province_id, area_council_id, attribute)
+WHERE agg.dataset_id = g.dataset_id
+AND agg.year IS NOT DISTINCT FROM g.year
+AND agg.province_id IS NOT DISTINCT FROM g.province_id
+AND agg.area_council_id IS NOT DISTINCT FROM g.area_council_id
+AND agg.attribute IS NOT DISTINCT FROM g.attribute
+"""
+
+INSERT_AGGREGATE_GROUPS_SQL = """
+INSERT INTO datasets_tabularaggregate (
+    dataset_id, year, province_id, area_council_id, attribute,
+    value_sum, value_count, value_min, value_max
+)
+SELECT
+    g.dataset_id, g.year, g.province_id, g.area_council_id, g.attribute,
+    SUM(item.value), COUNT(item.id), MIN(item.value), MAX(item.value)
+FROM datasets_tabularitem item
+JOIN (VALUES {values}) AS g (dataset_id, year, province_id, area_council_id, attribute)
+ON item.dataset_id = g.dataset_id
+AND EXTRACT(YEAR FROM item.date) IS NOT DISTINCT FROM g.year
+AND item.province_id IS NOT DISTINCT FROM g.province_id
+AND item.area_council_id IS NOT DISTINCT FROM g.area_council_id
+AND item.attribute IS NOT DISTINCT FROM g.attribute
+GROUP BY g.dataset_id, g.year, g.province_id, g.area_council_id, g.attribute
+"""
+
+
+def refresh_tabular_aggregate_groups(groups):
+    """
+    Rebuild the TabularAggregate rows of the given groups (see
+    tabular_aggregate_group()) from their TabularItems, in batches of one DELETE
+    and one INSERT ... SELECT. Groups left without items lose their row.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in chunked(groups, AGGREGATE_GROUPS_BATCH_SIZE):
+            values = ", ".join(
+                ["(%s::bigint, %s::integer, %s::bigint, %s::bigint, %s::varchar)"]
+                * len(batch)
+            )
+            params = [i for group in batch for i in group]
+            cursor.execute(DELETE_AGGREGATE_GROUPS_SQL.format(values=values), params)
+            cursor.execute(INSERT_AGGREGATE_GROUPS_SQL.format(values=values), params)
+
+
+def refresh_tabular_aggregates(datasets, groups=None):
+    """
+    Rebuild the TabularAggregate rows of the given datasets (instances, ids or a
+    queryset) from their TabularItems with one GROUP BY query, or only the rows of
+    the given aggregate groups, when the changed items are known. Called whenever
+    their items change, so it also invalidates their cached responses.
+    """
+    if isinstance(datasets, QuerySet):
+        datasets = list(datasets.values_list("pk", flat=True))
+    datasets = [getattr(i, "pk", i) for i in datasets]
+    if groups is not None:
+        refresh_tabular_aggregate_groups(groups)
+        bump_namespace(*(dataset_namespace("tabular", i) for i in datasets))
+        return
+
+    rows = (
+        TabularItem.objects.filter(dataset__in=datasets)
+        .order_by()
+        .values(
+            "dataset", "province", "area_council", "attribute", year=ExtractYear("date")
+        )
+        .annotate(
+            value_sum=Sum("value"),
+            value_count=Count("id"),
+            value_min=Min("value"),
+            value_max=Max("value"),
+        )
+    )
+    with transaction.atomic():
+        TabularAggregate.objects.filter(dataset__in=datasets).delete()
+        TabularAggregate.objects.bulk_create(
+            (
+                TabularAggregate(
+                    dataset_id=g["dataset"],
+                    year=g["year"],
+                    province_id=g["province"],
+                    area_council_id=g["area_council"],
+                    attribute=g["attribute"],
+                    value_sum=g["value_sum"],
+                    value_count=g["value_count"],
+                    value_min=g["value_min"],
+                    value_max=g["value_max"],
+                )
+                for g in rows
+            ),
+            batch_size=5000,
+        )
+    bump_namespace(*(dataset_namespace("tabular", i) for i in datasets))
@@ -1,10 +1,16 @@
+import tempfile
+
 import django_filters.rest_framework
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from drf_excel.mixins import XLSXFileMixin
-from drf_excel.renderers import XLSXRenderer
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.cache import cache
+from django.db.models import F, JSONField, Max, Min, Sum, TextField, Value
+from django.db.models.functions import Cast, Coalesce, JSONObject
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -14,26 +20,42 @@ from rest_framework_gis.pagination import GeoJsonPagination
 from vbos.datasets.filters import (
     PMTilesDatasetFilter,
     RasterDatasetFilter,
+    TabularAggregateFilter,
     TabularDatasetFilter,
     TabularItemFilter,
     VectorDatasetFilter,
     VectorItemFilter,
 )
 
+from .cache import RESPONSE_CACHE_KEY, CachedResponseMixin, ConditionalGetMixin
+from .exports import (
+    EXPORT_CHUNK_SIZE,
+    XLSX_CONTENT_TYPE,
+    encode_json,
+    iter_json_array,
+    iter_ndjson,
+    write_tabular_xlsx,
+)
 from .models import (
+    SIMPLIFICATION_TOLERANCES,
+    SIMPLIFIED_GEOMETRY_FIELDS,
     AreaCouncil,
     Cluster,
     PMTilesDataset,
     Province,
     RasterDataset,
+    TabularAggregate,
     TabularDataset,
     TabularItem,
     VectorDataset,
     VectorItem,
+    related_region_geometries,
 )
 from .pagination import (
+    CursorPaginationMixin,
     DataResultsSetPagination,
     DatasetListPagination,
+    GeoJsonCursorPagination,
     StandardResultsSetPagination,
 )
 from .serializers import (
@@ -42,20 +64,160 @@ from .serializers import (
     PMTilesDatasetSerializer,
     ProvinceSerializer,
     RasterDatasetSerializer,
+    TabularAggregateSerializer,
     TabularDatasetSerializer,
-    TabularItemExcelSerializer,
     TabularItemSerializer,
     VectorDatasetSerializer,
     VectorItemSerializer,
 )
+from .tiles import MVT_CONTENT_TYPE, is_valid_tile, vector_tile
+
+
+class StreamingExportMixin:
+    """
+    Stream the whole filtered queryset in one response, read from a server-side
+    cursor, as JSON ('output=json', the default) or NDJSON ('output=ndjson').
+    For the data views, which answer conditional requests in get().
+    """
+
+    pagination_class = None
+    export_name = None
+    json_head = "["
+    json_tail = "]"
+    json_content_type = "application/json"
+    json_extension = "json"
+
+    def get_export_items(self):
+        """The exported objects and the function encoding one of them as JSON text."""
+        objects = self.filter_queryset(self.get_queryset()).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE
+        )
+        serialize = self.get_serializer().to_representation
+        return objects, lambda obj: encode_json(serialize(obj))
+
+    def get_fresh_response(self, request, *args, **kwargs):
+        output = request.query_params.get("output", "json")
+        if output not in ("json", "ndjson"):
+            raise ValidationError({"output": "Must be 'json' or 'ndjson'."})
+
+        objects, encode = self.get_export_items()
+        if output == "ndjson":
+            content = iter_ndjson(objects, encode)
+            content_type, extension = "application/x-ndjson", "ndjson"
+        else:
+            content = iter_json_array(objects, encode, self.json_head, self.json_tail)
+            content_type, extension = self.json_content_type, self.json_extension
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f"attachment; filename=vbos-mis-{self.export_name}-{kwargs.get('pk')}"
+            f".{extension}"
+        )
+        return response
+
+
+class GeoJSONGeometryMixin:
+    """
+    Round coordinates to '?precision=<decimals>' (GEOJSON_PRECISION by default)
+    and, with the POSTGIS_GEOJSON setting, have PostGIS encode the geometries as
+    GeoJSON text (ST_AsGeoJSON) in the main query, instead of loading them into
+    GEOS and converting them feature by feature in Python.
+    """
+
+    max_precision = 15
+
+    def use_postgis_geojson(self) -> bool:
+        return settings.POSTGIS_GEOJSON
+
+    def get_geometry_precision(self) -> int:
+        value = self.request.query_params.get("precision")
+        if value is None:
+            return settings.GEOJSON_PRECISION
+        try:
+            precision = int(value)
+        except ValueError:
+            precision = -1
+        if not 0 <= precision <= self.max_precision:
+            raise ValidationError(
+                {"precision": f"Must be an integer between 0 and {self.max_precision}."}
+            )
+        return precision
+
+    def get_geometry_expression(self):
+        return F("geometry")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.use_postgis_geojson():
+            queryset = queryset.defer("geometry").annotate(
+                geometry_geojson=AsGeoJSON(
+                    self.get_geometry_expression(),
+                    precision=self.get_geometry_precision(),
+                )
+            )
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["geojson_geometry"] = self.use_postgis_geojson()
+        context["geometry_precision"] = self.get_geometry_precision()
+        return context
+
+
+class SimplifiedGeometryMixin(GeoJSONGeometryMixin):
+    """
+    Serve the precomputed simplified region geometries chosen with
+    '?simplify=high|medium|low' or '?zoom=<map zoom>' instead of the full ones.
+    """
+
+    # Most simplified level to use up to each zoom; full geometries above them
+    zoom_levels = [(7, "high"), (10, "medium"), (13, "low")]
+
+    def get_simplify_level(self):
+        params = self.request.query_params
+        if "simplify" in params:
+            level = params["simplify"]
+            if level not in SIMPLIFICATION_TOLERANCES:
+                levels = ", ".join(SIMPLIFICATION_TOLERANCES)
+                raise ValidationError({"simplify": f"Must be one of: {levels}."})
+            return level
+        if "zoom" in params:
+            try:
+                zoom = float(params["zoom"])
+            except ValueError:
+                raise ValidationError({"zoom": "Must be a number."})
+            for max_zoom, level in self.zoom_levels:
+                if zoom <= max_zoom:
+                    return level
+        return None
+
+    def get_geometry_expression(self):
+        level = self.get_simplify_level()
+        if level:
+            return Coalesce(f"geometry_simplified_{level}", "geometry")
+        return super().get_geometry_expression()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        queryset = queryset.defer(*SIMPLIFIED_GEOMETRY_FIELDS)
+        if self.get_simplify_level() and not self.use_postgis_geojson():
+            queryset = queryset.defer("geometry").annotate(
+                simplified_geometry=self.get_geometry_expression()
+            )
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["simplified_geometry"] = self.get_simplify_level() is not None
+        return context
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class ClusterDatasetsView(APIView):
+class ClusterDatasetsView(CachedResponseMixin, APIView):
     """Single endpoint returning all dataset types for a cluster in one response."""
+    cache_namespaces = ("clusters", "raster", "vector", "pmtiles", "tabular")
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def get_fresh_response(self, request, *args, **kwargs):
         cluster_name = request.query_params.get("cluster")
         if not cluster_name:
             return Response(
@@ -64,19 +226,27 @@ class ClusterDatasetsView(APIView):
             )
 
         tabular = TabularDatasetSerializer(
-            TabularDataset.objects.filter(cluster__name__iexact=cluster_name),
+            TabularDataset.objects.filter(
+                cluster__name__iexact=cluster_name
+            ).select_related("cluster"),
             many=True,
         ).data
         raster = RasterDatasetSerializer(
-            RasterDataset.objects.filter(cluster__name__iexact=cluster_name),
+            RasterDataset.objects.filter(
+                cluster__name__iexact=cluster_name
+            ).select_related("cluster"),
             many=True,
         ).data
         vector = VectorDatasetSerializer(
-            VectorDataset.objects.filter(cluster__name__iexact=cluster_name),
+            VectorDataset.objects.filter(
+                cluster__name__iexact=cluster_name
+            ).select_related("cluster"),
             many=True,
         ).data
         pmtiles = PMTilesDatasetSerializer(
-            PMTilesDataset.objects.filter(cluster__name__iexact=cluster_name),
+            PMTilesDataset.objects.filter(
+                cluster__name__iexact=cluster_name
+            ).select_related("cluster"),
             many=True,
         ).data
 
@@ -88,30 +258,26 @@ class ClusterDatasetsView(APIView):
         })
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class ClusterListView(ListAPIView):
+class ClusterListView(CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("clusters",)
     queryset = Cluster.objects.all().order_by("order")
     serializer_class = ClusterSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
-    def finalize_response(self, request, response, *args, **kwargs):
-        # Prevent browser from caching so admin changes (e.g. cluster add/delete) show after clear_cache
-        response = super().finalize_response(request, response, *args, **kwargs)
-        response["Cache-Control"] = "no-store, must-revalidate"
-        return response
-
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class ProvinceListView(ListAPIView):
+class ProvinceListView(SimplifiedGeometryMixin, CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("regions",)
     queryset = Province.objects.all()
     serializer_class = ProvinceSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = GeoJsonPagination
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class AreaCouncilListView(ListAPIView):
+class AreaCouncilListView(
+    SimplifiedGeometryMixin, CachedResponseMixin, ListAPIView
+):
+    cache_namespaces = ("regions",)
     serializer_class = AreaCouncilSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = GeoJsonPagination
@@ -122,55 +288,62 @@ class AreaCouncilListView(ListAPIView):
         )
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class RasterDatasetListView(ListAPIView):
-    queryset = RasterDataset.objects.all()
+class RasterDatasetListView(CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("clusters", "raster")
+    queryset = RasterDataset.objects.select_related("cluster")
     serializer_class = RasterDatasetSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = DatasetListPagination
     filterset_class = RasterDatasetFilter
 
 
-class RasterDatasetDetailView(RetrieveAPIView):
-    queryset = RasterDataset.objects.all()
+class RasterDatasetDetailView(ConditionalGetMixin, RetrieveAPIView):
+    cache_namespaces = ("clusters", "raster:{pk}")
+    queryset = RasterDataset.objects.select_related("cluster")
     serializer_class = RasterDatasetSerializer
     permission_classes = [IsAuthenticated]
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class PMTilesDatasetListView(ListAPIView):
-    queryset = PMTilesDataset.objects.all()
+class PMTilesDatasetListView(CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("clusters", "pmtiles")
+    queryset = PMTilesDataset.objects.select_related("cluster")
     serializer_class = PMTilesDatasetSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = DatasetListPagination
     filterset_class = PMTilesDatasetFilter
 
 
-class PMTilesDatasetDetailView(RetrieveAPIView):
-    queryset = PMTilesDataset.objects.all()
+class PMTilesDatasetDetailView(ConditionalGetMixin, RetrieveAPIView):
+    cache_namespaces = ("clusters", "pmtiles:{pk}")
+    queryset = PMTilesDataset.objects.select_related("cluster")
     serializer_class = PMTilesDatasetSerializer
     permission_classes = [IsAuthenticated]
 
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class VectorDatasetListView(ListAPIView):
-    queryset = VectorDataset.objects.all()
+class VectorDatasetListView(CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("clusters", "vector")
+    queryset = VectorDataset.objects.select_related("cluster")
     serializer_class = VectorDatasetSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = DatasetListPagination
     filterset_class = VectorDatasetFilter
 
 
-class VectorDatasetDetailView(RetrieveAPIView):
-    queryset = VectorDataset.objects.all()
+class VectorDatasetDetailView(ConditionalGetMixin, RetrieveAPIView):
+    cache_namespaces = ("clusters", "vector:{pk}")
+    queryset = VectorDataset.objects.select_related("cluster")
     serializer_class = VectorDatasetSerializer
     permission_classes = [IsAuthenticated]
 
 
-class VectorDatasetDataView(ListAPIView):
+class VectorDatasetDataView(
+    GeoJSONGeometryMixin, ConditionalGetMixin, CursorPaginationMixin, ListAPIView
+):
+    cache_namespaces = ("regions", "vector:{pk}")
     serializer_class = VectorItemSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = GeoJsonPagination
+    cursor_pagination_class = GeoJsonCursorPagination
     bbox_filter_field = "geometry"
     filterset_class = VectorItemFilter
     filter_backends = (
@@ -179,40 +352,197 @@ class VectorDatasetDataView(ListAPIView):
     )
 
     def get_queryset(self):
-        return VectorItem.objects.filter(dataset=self.kwargs.get("pk"))
+        return (
+            VectorItem.objects.filter(dataset=self.kwargs.get("pk"))
+            .select_related("province", "area_council")
+            .defer(*related_region_geometries("province", "area_council"))
+        )
+
+
+class VectorDatasetExportView(StreamingExportMixin, VectorDatasetDataView):
+    export_name = "vector"
+    json_head = '{"type":"FeatureCollection","features":['
+    json_tail = "]}"
+    json_content_type = "application/geo+json"
+    json_extension = "geojson"
+
+    def get_export_items(self):
+        if not self.use_postgis_geojson():
+            return super().get_export_items()
+
+        # Whole features built as JSON text by PostgreSQL, written out unparsed
+        features = (
+            self.filter_queryset(self.get_queryset())
+            .annotate(
+                feature=Cast(
+                    JSONObject(
+                        id="id",
+                        type=Value("Feature"),
+                        geometry=Cast("geometry_geojson", JSONField()),
+                        properties=JSONObject(
+                            name="name",
+                            ref="ref",
+                            attribute="attribute",
+                            province="province__name",
+                            area_council="area_council__name",
+                            metadata="metadata",
+                        ),
+                    ),
+                    TextField(),
+                )
+            )
+            .values_list("feature", flat=True)
+        )
+        return features.iterator(chunk_size=EXPORT_CHUNK_SIZE), str
+
+
+class IgnoreAcceptContentNegotiation(BaseContentNegotiation):
+    """Use the first renderer whatever the Accept header, for binary responses."""
 
+    def select_parser(self, request, parsers):
+        return parsers[0]
 
-@method_decorator(cache_page(60 * 15), name="dispatch")  # 15 min cache
-class TabularDatasetListView(ListAPIView):
-    queryset = TabularDataset.objects.all()
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class VectorDatasetTileView(ConditionalGetMixin, APIView):
+    """
+    Mapbox Vector Tile of the dataset's items intersecting tile z/x/y, encoded by
+    PostGIS. Tiles are cached until the dataset's items change.
+    """
+
+    cache_namespaces = ("regions", "vector:{pk}")
+    cache_timeout = 60 * 60 * 24  # 1 day cache
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = IgnoreAcceptContentNegotiation
+
+    def get_fresh_response(self, request, pk, z, x, y):
+        if not is_valid_tile(z, x, y):
+            raise Http404("Invalid tile coordinates.")
+
+        key = RESPONSE_CACHE_KEY.format(self.get_request_fingerprint(request))
+        tile = cache.get(key)
+        if tile is None:
+            if not VectorDataset.objects.filter(pk=pk).exists():
+                raise Http404("No VectorDataset matches the given query.")
+            tile = vector_tile(pk, z, x, y)
+            cache.set(key, tile, self.cache_timeout)
+        return HttpResponse(tile, content_type=MVT_CONTENT_TYPE)
+
+
+class TabularDatasetListView(CachedResponseMixin, ListAPIView):
+    cache_namespaces = ("clusters", "tabular")
+    queryset = TabularDataset.objects.select_related("cluster")
     serializer_class = TabularDatasetSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = DatasetListPagination
     filterset_class = TabularDatasetFilter
 
 
-class TabularDatasetDetailView(RetrieveAPIView):
-    queryset = TabularDataset.objects.all()
+class TabularDatasetDetailView(ConditionalGetMixin, RetrieveAPIView):
+    cache_namespaces = ("clusters", "tabular:{pk}")
+    queryset = TabularDataset.objects.select_related("cluster")
     serializer_class = TabularDatasetSerializer
     permission_classes = [IsAuthenticated]
 
 
-class TabularDatasetDataView(ListAPIView):
+class TabularDatasetDataView(ConditionalGetMixin, CursorPaginationMixin, ListAPIView):
+    cache_namespaces = ("regions", "tabular:{pk}")
     filterset_class = TabularItemFilter
     permission_classes = [IsAuthenticated]
     serializer_class = TabularItemSerializer
     pagination_class = DataResultsSetPagination
 
     def get_queryset(self):
-        return TabularItem.objects.filter(
-            dataset=self.kwargs.get("pk")
-        ).select_related("province", "area_council")
+        return (
+            TabularItem.objects.filter(dataset=self.kwargs.get("pk"))
+            .select_related("province", "area_council")
+            .defer(*related_region_geometries("province", "area_council"))
+        )
+
+
+class TabularDatasetExportView(StreamingExportMixin, TabularDatasetDataView):
+    export_name = "tabular"
+
 
+class TabularDatasetAggregateView(ConditionalGetMixin, ListAPIView):
+    """
+    Sum, count, min and max of a tabular dataset's values, read from the precomputed
+    TabularAggregate table. Groups by year, province, area_council and attribute,
+    or by the comma-separated subset of them given in the 'group_by' parameter.
+    """
 
-class TabularDatasetXSLXDataView(XLSXFileMixin, TabularDatasetDataView):
-    serializer_class = TabularItemExcelSerializer
-    renderer_classes = (XLSXRenderer,)
+    cache_namespaces = ("regions", "tabular:{pk}")
+    filterset_class = TabularAggregateFilter
+    permission_classes = [IsAuthenticated]
+    serializer_class = TabularAggregateSerializer
     pagination_class = None
+    group_fields = {
+        "year": "year",
+        "province": "province__name",
+        "area_council": "area_council__name",
+        "attribute": "attribute",
+    }
+
+    def get_queryset(self):
+        return TabularAggregate.objects.filter(dataset=self.kwargs.get("pk"))
+
+    def get_group_by(self):
+        group_by = self.request.query_params.get("group_by")
+        if not group_by:
+            return list(self.group_fields)
+        fields = [i.strip() for i in group_by.split(",") if i.strip()]
+        invalid = [i for i in fields if i not in self.group_fields]
+        if invalid:
+            raise ValidationError(
+                {"group_by": f"Invalid fields: {', '.join(invalid)}"}
+            )
+        return fields
+
+    def list(self, request, *args, **kwargs):
+        group_by = self.get_group_by()
+        columns = [self.group_fields[i] for i in group_by]
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by(*columns)
+            .values(*columns)
+            .annotate(
+                sum=Sum("value_sum"),
+                count=Sum("value_count"),
+                min=Min("value_min"),
+                max=Max("value_max"),
+            )
+        )
+        data = [
+            {
+                **{field: row[self.group_fields[field]] for field in group_by},
+                "sum": row["sum"],
+                "count": row["count"],
+                "min": row["min"],
+                "max": row["max"],
+            }
+            for row in rows
+        ]
+        return Response(self.get_serializer(data, many=True).data)
+
+
+class TabularDatasetXSLXDataView(TabularDatasetDataView):
+    """
+    The filtered tabular data as an XLSX file. The workbook is written in
+    write-only mode to a temporary file, then streamed from disk.
+    """
 
-    def get_filename(self, request, *args, **kwargs):
-        return f"vbos-mis-tabular-{kwargs.get('pk')}.xlsx"
+    pagination_class = None
+
+    def get_fresh_response(self, request, *args, **kwargs):
+        file = tempfile.TemporaryFile()
+        write_tabular_xlsx(self.filter_queryset(self.get_queryset()), file)
+        file.seek(0)
+        response = FileResponse(
+            file, content_type=f"{XLSX_CONTENT_TYPE}; charset=utf-8"
+        )
+        response["Content-Disposition"] = (
+            f"attachment; filename=vbos-mis-tabular-{kwargs.get('pk')}.xlsx"
+        )
+        return response
@@ -0,0 +1,43 @@
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .models import Cluster, Province
+
+
+def warm_paths():
+    """The URLs the frontend requests on load that are served by cached views."""
+    yield f"{reverse('datasets:cluster-list')}?page_size=100"
+    yield f"{reverse('datasets:province-list')}?simplify=medium"
+    for name in Province.objects.values_list("name", flat=True):
+        yield f"{reverse('datasets:area-council-list', args=[name])}?simplify=low"
+    for name in Cluster.objects.values_list("name", flat=True):
+        yield f"{reverse('datasets:cluster-datasets')}?{urlencode({'cluster': name})}"
+
+
+def warm_cache(base_url: str = None):
+    """
+    Render warm_paths() through their views, as seen at ``base_url`` (defaults to
+    the CACHE_WARM_URL setting), so that the next requests are served from the
+    cache. Returns a list of (path, status_code).
+    """
+    base_url = base_url or settings.CACHE_WARM_URL
+    if not base_url:
+        raise ImproperlyConfigured(
+            "Set DJANGO_CACHE_WARM_URL to the scheme and host the API is served at."
+        )
+    url = urlsplit(base_url)
+    factory = APIRequestFactory()
+    user = get_user_model()(username="warm_cache")
+    results = []
+    for path in warm_paths():
+        request = factory.get(path, HTTP_HOST=url.netloc, secure=url.scheme == "https")
+        force_authenticate(request, user=user)
+        match = resolve(request.path_info)
+        response = match.func(request, *match.args, **match.kwargs)
+        results.append((path, response.status_code))
+    return results
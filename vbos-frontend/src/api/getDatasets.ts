@@ -3,6 +3,7 @@ import {
   Dataset,
   ClusterDatasets,
   PaginatedVectorData,
+  TabularAggregate,
   TabularData,
 } from "@/types/api";
 
@@ -56,7 +57,7 @@ export async function getDatasets(cluster: string): Promise<ClusterDatasets[]> {
 }
 
 interface ListApiResponse {
-  count: number;
+  count?: number;
   next: string | null;
   previous: string | null;
   results: TabularData[];
@@ -67,35 +68,32 @@ export async function getDatasetData(
   id: number,
   filters?: URLSearchParams,
 ) {
-  let allResults: PaginatedVectorData | ListApiResponse | null = null;
   const queryString = filters ? new URLSearchParams(filters).toString() : "";
-  const url = `/api/v1/${dataType}/${id}/data/?page_size=2000${queryString ? `&${queryString}` : ""}`;
+  // The export endpoint streams the whole filtered dataset in one response.
+  const url = `/api/v1/${dataType}/${id}/export/${queryString ? `?${queryString}` : ""}`;
 
-  let currentUrl: string | null = url;
+  const response = await HTTP.get(url);
+  if (!response.ok) throw new Error(`Unable to fetch data from ${url}`);
 
-  while (currentUrl) {
-    const response = await HTTP.get(currentUrl);
-    if (!response.ok)
-      throw new Error(`Unable to fetch data from ${currentUrl}`);
+  const data = await response.json();
+  if (dataType === "vector") return data as PaginatedVectorData;
 
-    const data = await response.json();
-
-    if (!allResults) {
-      allResults = data;
-    } else {
-      if (dataType === "vector" && "features" in allResults) {
-        (allResults as PaginatedVectorData).features.push(...data.features);
-      }
-      if (dataType === "tabular" && "results" in allResults) {
-        (allResults as ListApiResponse).results.push(...data.results);
-      }
-    }
-
-    // Extract relative path from next URL if it exists
-    currentUrl = data.next
-      ? new URL(data.next).pathname + new URL(data.next).search
-      : null;
-  }
+  return {
+    count: data.length,
+    next: null,
+    previous: null,
+    results: data,
+  } as ListApiResponse;
+}
 
-  return allResults as PaginatedVectorData | ListApiResponse;
+export async function getDatasetAggregates(
+  id: number,
+  params: URLSearchParams,
+): Promise<TabularAggregate[]> {
+  const queryString = new URLSearchParams(params).toString();
+  const url = `/api/v1/tabular/${id}/aggregates/${queryString ? `?${queryString}` : ""}`;
+
+  const response = await HTTP.get(url);
+  if (!response.ok) throw new Error(`Unable to fetch data from ${url}`);
+  return response.json();
 }
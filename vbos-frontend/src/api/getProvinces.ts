@@ -2,7 +2,7 @@ import * as HTTP from "./http";
 import { ProvincesGeoJSON } from "@/types/data";
 
 export function getProvinces(): Promise<ProvincesGeoJSON> {
-  return HTTP.get("/api/v1/provinces/").then((r) => {
+  return HTTP.get("/api/v1/provinces/?simplify=medium").then((r) => {
     if (!r.ok) throw new Error("Unable to get provinces.");
     return r.json();
   });
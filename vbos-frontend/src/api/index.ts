@@ -1,7 +1,11 @@
 import { getAreaCouncils } from "./getAreaCouncils";
 import { getProvinces } from "./getProvinces";
 import { getClusters } from "./getClusters";
-import { getDatasets, getDatasetData } from "./getDatasets";
+import {
+  getDatasets,
+  getDatasetData,
+  getDatasetAggregates,
+} from "./getDatasets";
 import { getXLSXData } from "./getXLSXData";
 
 export default {
@@ -10,5 +14,6 @@ export default {
   getClusters,
   getDatasets,
   getDatasetData,
+  getDatasetAggregates,
   getXLSXData,
 };
@@ -4,19 +4,32 @@ import { useDateStore } from "@/store/date-store";
 import { useLayerStore } from "@/store/layer-store";
 import { AreaCouncilGeoJSON, ProvincesGeoJSON } from "@/types/data";
 import { getAreaCouncilValue, getProvinceValue } from "@/utils/getValue";
+import { useDatasetAggregates } from "@/hooks/useDatasetAggregates";
 import { featureCollection } from "@turf/helpers";
 
 const useAdminAreaStats = (
   geojson: ProvincesGeoJSON | AreaCouncilGeoJSON = featureCollection([]),
 ) => {
   const { ac, province } = useAreaStore();
-  const { tabularLayerData } = useLayerStore();
+  const { layers } = useLayerStore();
   const { year } = useDateStore();
 
+  // Sum the active tabular layer per province, or per area council of the
+  // selected province, from its precomputed aggregates
+  const tabularLayer = layers.split(",").find((i) => i.startsWith("t"));
+  const params = new URLSearchParams({
+    group_by: province ? "area_council" : "province",
+  });
+  if (year) params.set("year", year);
+  if (province) params.set("province", province);
+  if (ac) params.set("area_council", ac);
+  const { data: aggregates } = useDatasetAggregates(
+    tabularLayer ? Number(tabularLayer.slice(1)) : null,
+    params,
+  );
+
   return useMemo(() => {
-    const filteredData = tabularLayerData.filter((i) =>
-      i.date.startsWith(year),
-    );
+    const rows = aggregates ?? [];
 
     if (!geojson?.features?.length) {
       return {
@@ -38,7 +51,7 @@ const useAdminAreaStats = (
       updatedGeojson.features.forEach(
         (p) =>
           (p.properties.value = getProvinceValue(
-            filteredData,
+            rows,
             p.properties.name,
           )),
       );
@@ -47,7 +60,7 @@ const useAdminAreaStats = (
       updatedGeojson.features.forEach(
         (c) =>
           (c.properties.value = getAreaCouncilValue(
-            filteredData,
+            rows,
             c.properties.name,
           )),
       );
@@ -67,7 +80,7 @@ const useAdminAreaStats = (
       minValue: values[0],
       maxValue: values[values.length - 1],
     };
-  }, [ac, province, tabularLayerData, year, geojson]);
+  }, [province, aggregates, geojson]);
 };
 
 export { useAdminAreaStats };
@@ -0,0 +1,22 @@
+import { useQuery } from "@tanstack/react-query";
+import API from "@/api";
+
+function useDatasetAggregates(id: number | null, params: URLSearchParams) {
+  const { isPending, error, data } = useQuery({
+    queryKey: [
+      "dataset-aggregates",
+      id,
+      new URLSearchParams(params).toString(),
+    ],
+    queryFn: () => API.getDatasetAggregates(id as number, params),
+    enabled: id !== null,
+  });
+
+  return {
+    isPending,
+    error,
+    data,
+  };
+}
+
+export { useDatasetAggregates };
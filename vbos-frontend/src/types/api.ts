@@ -73,8 +73,19 @@ export interface TabularData {
   [key: string]: string | number | undefined; // Allow other API fields
 }
 
-export interface PaginatedVectorData {
+export interface TabularAggregate {
+  year?: number | null;
+  province?: string | null;
+  area_council?: string | null;
+  attribute?: string | null;
+  sum: number;
   count: number;
+  min: number | null;
+  max: number | null;
+}
+
+export interface PaginatedVectorData {
+  count?: number;
   next: string | null;
   previous: string | null;
   type: "FeatureCollection";
@@ -1,13 +1,21 @@
 import { expect, test } from "vitest";
 import { getAreaCouncilValue, getProvinceValue } from "./getValue";
-import * as tabularData from "./fixtures/tabularData.json";
+
+const provinces = [
+  { province: "MALAMPA", sum: 197, count: 12, min: 1, max: 40 },
+  { province: "TORBA", sum: 55, count: 4, min: 5, max: 20 },
+];
+
+const areaCouncils = [
+  { area_council: "Central Malekula", sum: 17, count: 3, min: 2, max: 9 },
+  { area_council: "South West Malekula", sum: 8, count: 2, min: 3, max: 5 },
+];
 
 test("getProvinceValue", () => {
-  expect(getProvinceValue(tabularData.results, "MALAMPA")).toEqual(197);
+  expect(getProvinceValue(provinces, "Malampa")).toEqual(197);
+  expect(getProvinceValue(provinces, "TAFEA")).toEqual(0);
 });
 
 test("getAreaCouncilValue", () => {
-  expect(getAreaCouncilValue(tabularData.results, "Central Malekula")).toEqual(
-    17,
-  );
+  expect(getAreaCouncilValue(areaCouncils, "Central Malekula")).toEqual(17);
 });
@@ -1,18 +1,19 @@
-import { TabularData } from "@/types/api";
+import { TabularAggregate } from "@/types/api";
 
-export function getProvinceValue(items: TabularData[], province: string) {
-  return items
+export function getProvinceValue(
+  aggregates: TabularAggregate[],
+  province: string,
+) {
+  return aggregates
     .filter((i) => i.province?.toLowerCase() === province.toLowerCase())
-    .map((i: TabularData) => i.value)
-    .reduce((acc: number, value: number) => acc + value, 0);
+    .reduce((acc: number, i: TabularAggregate) => acc + i.sum, 0);
 }
 
 export function getAreaCouncilValue(
-  items: TabularData[],
+  aggregates: TabularAggregate[],
   area_council: string,
 ) {
-  return items
+  return aggregates
     .filter((i) => i.area_council?.toLowerCase() === area_council.toLowerCase())
-    .map((i: TabularData) => i.value)
-    .reduce((acc: number, value: number) => acc + value, 0);
+    .reduce((acc: number, i: TabularAggregate) => acc + i.sum, 0);
 }